@@ -0,0 +1,158 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw API responses, content-addressed by request path.
+
+    Each response is stored in a file named after the hash of its path, marked as
+    immutable if it was stored as such. Only those never expire: any other response
+    expires after the TTL of its endpoint, even if it is read as immutable later on,
+    since it may have been fetched before it stopped changing. The file
+    modification time records when the response was fetched, while the access time
+    is used to evict least recently used responses once ``max_size`` is exceeded.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        ttl: Dict[str, Optional[float]] = None,
+        default_ttl: Optional[float] = 0,
+        max_size: int = None,
+    ):
+        """
+        :param cache_dir: folder where responses are stored
+        :param ttl: time to live (secs) by endpoint. Keys are regular expressions
+            matched against the request path, and the first match is used. A value
+            of ``None`` means that responses never expire
+        :param default_ttl: time to live (secs) for paths not matching any rule.
+            A value of ``0`` disables caching for them
+        :param max_size: maximum size (bytes) of the cache
+        """
+
+        self._cache_dir = Path(cache_dir)
+        self._ttl = [(re.compile(k), v) for k, v in (ttl if ttl else {}).items()]
+        self._default_ttl = default_ttl
+        self._max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    def get_ttl(self, path: str, immutable: bool = False) -> Optional[float]:
+        """
+        Time to live of the response for a given path
+
+        :param path: request path
+        :param immutable: the response is known not to change anymore
+
+        :return: time to live (secs), ``None`` if it never expires
+        """
+
+        if immutable:
+            return None
+        for pattern, ttl in self._ttl:
+            if pattern.match(path):
+                return ttl
+        return self._default_ttl
+
+    def open(self, path: str, immutable: bool = False) -> Optional[BinaryIO]:
+        """
+        Opens the cached response for a path
+
+        :param path: request path
+        :param immutable: kept for symmetry with `store`. Whether a response never
+            expires is decided when it is stored, not when it is read
+
+        :return: binary buffer, ``None`` if the response is not cached or expired
+        """
+
+        for file, ttl in [
+            (self._get_file(path, immutable=True), None),
+            (self._get_file(path), self.get_ttl(path)),
+        ]:
+            try:
+                stat = file.stat()
+                now = time.time()
+                if ttl is not None and now - stat.st_mtime >= ttl:
+                    continue
+                os.utime(file, (now, stat.st_mtime))
+                return open(file, "rb")
+            except FileNotFoundError:
+                continue
+        return None
+
+    def store(self, path: str, buffer: BinaryIO, immutable: bool = False) -> BinaryIO:
+        """
+        Stores a response in the cache
+
+        :param path: request path
+        :param buffer: response to store
+        :param immutable: the response is known not to change anymore, so it never
+            expires
+
+        :return: binary buffer with the stored response
+        """
+
+        if self.get_ttl(path, immutable) == 0:
+            return io.BytesIO(buffer.read())
+
+        file = self._get_file(path, immutable)
+        replaced = [file, self._get_file(path)] if immutable else [file]
+        with tempfile.NamedTemporaryFile(
+            dir=self._cache_dir, prefix=".tmp", delete=False
+        ) as tmp:
+            shutil.copyfileobj(buffer, tmp)
+            size = tmp.tell()
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            for replaced_file in replaced:
+                if replaced_file.exists():
+                    self._size -= replaced_file.stat().st_size
+            os.replace(tmp.name, file)
+            if immutable and replaced[1].exists():
+                os.remove(replaced[1])
+            self._size += size
+            stored = open(file, "rb")
+            if self._max_size is not None and self._size > self._max_size:
+                self._evict()
+
+        return stored
+
+    def _get_file(self, path: str, immutable: bool = False) -> Path:
+        key = hashlib.sha256(path.encode("utf-8")).hexdigest()
+        if immutable:
+            return self._cache_dir / f"{key}.immutable.json"
+        return self._cache_dir / f"{key}.json"
+
+    def _scan_size(self) -> int:
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self._cache_dir)
+            if entry.name.endswith(".json")
+        )
+
+    def _evict(self):
+        """Removes least recently used responses until the cache fits its size"""
+
+        entries = [
+            (entry.stat().st_atime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self._cache_dir)
+            if entry.name.endswith(".json")
+        ]
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, file in sorted(entries):
+            if self._size <= self._max_size:
+                break
+            os.remove(file)
+            self._size -= size
@@ -1,6 +1,13 @@
-import urllib
+import socket
+import threading
+import time
+import urllib.error
 from abc import abstractmethod
-from http.client import HTTPResponse
+from http.client import HTTPException, HTTPResponse, HTTPSConnection
+from typing import List, Optional, Tuple
+
+# Seconds a request can block waiting for the API
+DEFAULT_TIMEOUT = 30.0
 
 
 class ApiConnector:
@@ -9,18 +16,164 @@ class ApiConnector:
         pass
 
 
+class HTTPSConnectionPool:
+    """Keeps a pool of keep-alive connections to a single host"""
+
+    def __init__(
+        self,
+        host: str,
+        pool_size: int = 4,
+        idle_timeout: float = 60.0,
+        timeout: Optional[float] = socket._GLOBAL_DEFAULT_TIMEOUT,
+    ):
+        """
+        :param host: host to connect to
+        :param pool_size: maximum number of idle connections kept
+        :param idle_timeout: seconds before an idle connection is dropped
+        :param timeout: seconds socket operations can block. By default, that of
+            `socket.getdefaulttimeout`, and ``None`` blocks forever
+        """
+
+        self._host = host
+        self._pool_size = pool_size
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        self._idle: List[Tuple[HTTPSConnection, float]] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[HTTPSConnection, bool]:
+        """
+        Takes a connection from the pool, opening a new one if none is idle
+
+        :return: connection and whether it was reused from the pool
+        """
+
+        with self._lock:
+            self._drop_expired()
+            if self._idle:
+                connection, _ = self._idle.pop()
+                return connection, True
+        return HTTPSConnection(self._host, timeout=self._timeout), False
+
+    def put(self, connection: HTTPSConnection):
+        """Returns a connection to the pool, closing it if the pool is full"""
+
+        with self._lock:
+            if len(self._idle) < self._pool_size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def close(self):
+        """Closes all idle connections"""
+
+        with self._lock:
+            for connection, _ in self._idle:
+                connection.close()
+            self._idle = []
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] >= self._idle_timeout:
+            connection, _ = self._idle.pop(0)
+            connection.close()
+
+
+class PooledResponse:
+    """
+    File-like HTTP response that hands its connection back to the pool once it
+    is closed
+    """
+
+    def __init__(
+        self,
+        response: HTTPResponse,
+        connection: HTTPSConnection,
+        pool: HTTPSConnectionPool,
+    ):
+        self._response = response
+        self._connection = connection
+        self._pool = pool
+
+    @property
+    def status(self) -> int:
+        return self._response.status
+
+    @property
+    def reason(self) -> str:
+        return self._response.reason
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    def read(self, amt: int = None) -> bytes:
+        return self._response.read(amt)
+
+    def close(self, reuse: bool = True):
+        if self._connection is None:
+            return
+        if reuse and not self._response.will_close:
+            # The body must be consumed before the connection can be reused
+            self._response.read()
+            self._response.close()
+            self._pool.put(self._connection)
+        else:
+            self._response.close()
+            self._connection.close()
+        self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(reuse=exc_type is None)
+
+
 class RapidApiConnector(ApiConnector):
-    def __init__(self, api_key):
+    def __init__(
+        self,
+        api_key,
+        pool_size: int = 4,
+        idle_timeout: float = 60.0,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ):
         self._api_key = api_key
-        self._base_url = "https://api-football-v1.p.rapidapi.com/v2"
+        self._host = "api-football-v1.p.rapidapi.com"
+        self._base_url = f"https://{self._host}/v2"
+        self._base_path = "/v2"
         self._headers = {
-            "x-rapidapi-host": "api-football-v1.p.rapidapi.com",
+            "x-rapidapi-host": self._host,
             "x-rapidapi-key": api_key,
             "useQueryString": True,
         }
+        self._pool = HTTPSConnectionPool(
+            self._host, pool_size=pool_size, idle_timeout=idle_timeout, timeout=timeout
+        )
 
-    def read(self, path="", mode=None) -> HTTPResponse:
-        url = "/".join([self._base_url, path])
-        req = urllib.request.Request(url, headers=self._headers)
-        response = urllib.request.urlopen(req)
+    def read(self, path="", mode=None) -> PooledResponse:
+        url_path = "/".join([self._base_path, path])
+        response = self._request(url_path)
+        if response.status >= 400:
+            response.close()
+            raise urllib.error.HTTPError(
+                "/".join([self._base_url, path]),
+                response.status,
+                response.reason,
+                response.headers,
+                None,
+            )
         return response
+
+    def _request(self, url_path: str) -> PooledResponse:
+        while True:
+            connection, reused = self._pool.get()
+            try:
+                connection.request("GET", url_path, headers=self._headers)
+                return PooledResponse(connection.getresponse(), connection, self._pool)
+            except (HTTPException, OSError):
+                connection.close()
+                # Idle connections may have been dropped by the server: retry
+                # with a fresh one, but only fail on fresh connections
+                if not reused:
+                    raise
@@ -1,43 +1,114 @@
 import json
+from typing import Iterator, Union
 
 import pandas as pd
 
+from gg_ez.api.cache import ResponseCache
+from gg_ez.api.rate_limiter import RateLimiter
+from gg_ez.utilities.io import iter_json_items
+
 
 class JSONHandler:
     """
     Parses json from buffer into dict or pd.DataFrame
     """
 
-    def __init__(self, api_connector, **kwargs):
+    def __init__(
+        self,
+        api_connector,
+        cache: ResponseCache = None,
+        rate_limiter: RateLimiter = None,
+        **kwargs,
+    ):
         self.connector = api_connector
+        self.cache = cache
+        self.rate_limiter = rate_limiter
         self.kwargs = kwargs
 
-    def get_json(self, path: str, **kwargs) -> dict:
+    def get_json(
+        self,
+        path: str,
+        immutable: bool = False,
+        rate_limiter: RateLimiter = None,
+        subset: list = None,
+        stream: bool = False,
+        **kwargs,
+    ) -> Union[dict, Iterator]:
         """
         Parse into dict
+
+        :param path: request path
+        :param immutable: the response is known not to change anymore, so a cached
+            copy never expires
+        :param rate_limiter: paces the request if it isn't served from cache,
+            instead of the one of the handler
+        :param subset: path of keys to return only part of the document
+        :param stream: return a generator of the records of the array found under
+            ``subset`` instead, parsed incrementally with `iter_records`
         """
+        if stream:
+            return self.iter_records(path, subset, immutable, rate_limiter)
+
         merged_kwargs = self._merge(kwargs)
-        with self.connector.read(path) as buffer:
+        with self._read(path, immutable, rate_limiter) as buffer:
             data = json.load(buffer, **merged_kwargs)
+        if subset:
+            data = self._access_dictionary_subset(data, subset)
         return data
 
-    def get_table(self, path: str, subset: list = None, **kwargs):
+    def get_table(
+        self, path: str, subset: list = None, immutable: bool = False, **kwargs
+    ):
         """
         Parse into table
         """
         if not subset:
             subset = []
 
-        with self.connector.read(path) as response:
+        with self._read(path, immutable) as response:
             data = json.load(response)
             if subset is not None:
                 data = self._access_dictionary_subset(data, subset)
         return pd.DataFrame(data, **kwargs)
 
+    def iter_records(
+        self,
+        path: str,
+        subset: list = None,
+        immutable: bool = False,
+        rate_limiter: RateLimiter = None,
+    ) -> Iterator:
+        """
+        Parse incrementally, yielding one at a time the records of the array found
+        under ``subset``, so that the full document is never held in memory
+        """
+        with self._read(path, immutable, rate_limiter) as buffer:
+            yield from iter_json_items(buffer, subset)
+
     def save(self, item: dict, path: str, **kwargs):
         with self.connector.write(path) as buffer:
             json.dump(item, buffer)
 
+    def _read(
+        self, path: str, immutable: bool = False, rate_limiter: RateLimiter = None
+    ):
+        """
+        Reads a response from cache if available, otherwise from the connector. Only
+        requests to the connector wait for the rate limiter
+        """
+
+        cached = self.cache.open(path, immutable) if self.cache is not None else None
+        if cached is not None:
+            return cached
+
+        rate_limiter = rate_limiter if rate_limiter is not None else self.rate_limiter
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        if self.cache is None:
+            return self.connector.read(path)
+        with self.connector.read(path) as response:
+            return self.cache.store(path, response, immutable)
+
     def _merge(self, kwargs):
         new_kwargs = self.kwargs.copy()
         new_kwargs.update(kwargs)
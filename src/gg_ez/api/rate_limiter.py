@@ -0,0 +1,139 @@
+import datetime
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Union
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Holds up to ``capacity`` tokens, refilled at ``rate``
+    tokens per second
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError(f"got rate={rate}, expected a positive number")
+        self._rate = rate
+        self._capacity = capacity if capacity else max(rate, 1)
+        self._tokens = self._capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes one token from the bucket. Tokens can be borrowed, so concurrent
+        callers queue up behind each other
+
+        :return: seconds to wait until the reserved token is available
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity, self._tokens + (now - self._last) * self._rate
+            )
+            self._last = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+
+class DailyQuota:
+    """
+    Thread-safe budget of calls per calendar day (local time). If a file is given,
+    usage is persisted to it, so that runs on the same day share the budget
+    """
+
+    def __init__(self, limit: int, usage_file: Union[str, Path] = None):
+        if limit <= 0:
+            raise ValueError(f"got limit={limit}, expected a positive number")
+        self._limit = limit
+        self._usage_file = Path(usage_file) if usage_file else None
+        self._day = datetime.date.today()
+        self._count = 0
+        self._lock = threading.Lock()
+        if self._usage_file is not None and self._usage_file.exists():
+            with open(self._usage_file) as file:
+                usage = json.load(file)
+            day = datetime.datetime.strptime(usage["day"], "%Y-%m-%d").date()
+            if day >= self._day:
+                self._day, self._count = day, usage["count"]
+
+    def reserve(self) -> float:
+        """
+        Takes one call from the budget. Once a day is used up, calls are reserved
+        from the next one, so concurrent callers queue up behind each other
+
+        :return: seconds to wait until the day of the reserved call starts
+        """
+
+        with self._lock:
+            today = datetime.date.today()
+            if self._day < today:
+                self._day, self._count = today, 0
+            if self._count >= self._limit:
+                self._day, self._count = self._day + datetime.timedelta(days=1), 0
+            self._count += 1
+            self._save()
+            start = datetime.datetime.combine(self._day, datetime.time())
+            return max((start - datetime.datetime.now()).total_seconds(), 0.0)
+
+    def _save(self):
+        if self._usage_file is None:
+            return
+        tmp_path = self._usage_file.with_name(f"{self._usage_file.name}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"day": self._day.isoformat(), "count": self._count}, file)
+        os.replace(tmp_path, self._usage_file)
+
+
+class RateLimiter:
+    """
+    Shares a set of quotas (e.g. per-second and per-day) across all the threads
+    calling an API
+    """
+
+    def __init__(
+        self,
+        per_second: float = None,
+        per_day: int = None,
+        usage_file: Union[str, Path] = None,
+    ):
+        """
+        :param per_second: calls per second, with bursts of up to a second of calls
+        :param per_day: calls per calendar day
+        :param usage_file: file keeping the calls of the day, so that the per-day
+            quota holds across runs. Without it, only calls of this process count
+        """
+
+        self._buckets: List[Union[TokenBucket, DailyQuota]] = []
+        if per_second:
+            self._buckets.append(TokenBucket(per_second))
+        if per_day:
+            self._buckets.append(DailyQuota(per_day, usage_file))
+
+    def acquire(self):
+        """Blocks until all quotas allow one more call"""
+
+        wait = max([bucket.reserve() for bucket in self._buckets], default=0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def limit(self, fun: Callable) -> Callable:
+        """
+        Wraps a function so that every call waits for the rate limiter
+
+        :param fun: function to wrap
+
+        :return: rate-limited function
+        """
+
+        def limited(*args, **kwargs):
+            self.acquire()
+            return fun(*args, **kwargs)
+
+        return limited
@@ -1,15 +1,24 @@
+import hashlib
+import json
+import logging
 import os
+import zlib
+from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Set
 
 from kedro.io import AbstractDataSet
 
 from gg_ez.utilities.folder_data import (
+    DEFAULT_CACHE_SIZE,
+    MANIFEST_FILE,
     CSVFolderData,
     ExcelFolderData,
     FolderData,
     HDFFolderData,
     JSONFolderData,
+    PackedLocation,
+    ParquetFolderData,
 )
 
 DATA_FOLDER_OBJECTS = {
@@ -18,11 +27,29 @@ DATA_FOLDER_OBJECTS = {
     "xlsx": ExcelFolderData,
     "hdf": HDFFolderData,
     "h5": HDFFolderData,
+    "parquet": ParquetFolderData,
 }
 
+SAVE_MODES = ["overwrite", "upsert"]
+
+# Packs are compacted when their live ids take less than this share of the file
+COMPACTION_RATIO = 0.5
+
 
 class FolderDataDataset(AbstractDataSet):
-    """Handles i/o for data that is split into files inside of a folder"""
+    """
+    Handles i/o for data that is split into files inside of a folder.
+
+    By default each id is stored in its own ``{id}_{suffix}.{format}`` file. If
+    ``n_partitions`` is given, ids are instead packed into that many
+    ``{partition}_{suffix}.{format}pack`` files. Overwriting rewrites the packs of
+    the saved ids. Upserting appends the changed ids to their packs and points the
+    manifest to the new copies, rewriting a pack once replaced copies take most of
+    its space.
+
+    A manifest keeps the path, offset (packed files only), size, content hash and
+    modification time of every id, so loads don't need to scan the folder.
+    """
 
     def __init__(
         self,
@@ -31,42 +58,140 @@ class FolderDataDataset(AbstractDataSet):
         suffix: str,
         id_list=None,
         lazy=True,
+        load_args=None,
         save_args=None,
+        workers: int = 1,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        n_partitions: int = None,
+        save_mode: str = "overwrite",
     ):
+        if save_mode not in SAVE_MODES:
+            raise ValueError(f"got save_mode={save_mode}, expected one of {SAVE_MODES}")
+
         self._filepath = Path(filepath)
         self._format = data_format
         self.folder_data_object = self._get_folder_data_object()
+        serializable = self.folder_data_object.can_serialize()
+        if (n_partitions or save_mode == "upsert") and not serializable:
+            raise ValueError(
+                f"{data_format} files can't be serialized, as needed by "
+                + f"n_partitions={n_partitions} and save_mode={save_mode}"
+            )
         self._suffix = suffix
         self._id_list = id_list
         self._lazy = lazy
+        self._load_args = load_args if load_args else {}
         self._save_args = save_args if save_args else {}
+        self._workers = workers
+        self._cache_size = cache_size
+        self._n_partitions = n_partitions
+        self._save_mode = save_mode
 
     def _load(self) -> FolderData:
         """Explores directory and returns a `FolderData` object containing all files"""
-        if self._filepath.exists():
-            files_in_path = os.listdir(self._filepath)
-            files_in_path = [
-                file for file in files_in_path if f".{self._format}" in file
-            ]
-            full_paths = [self._filepath / file for file in files_in_path]
-            ids = [file.split(f"_{self._suffix}")[0] for file in files_in_path]
-            paths_dict = {k: v for k, v in zip(ids, full_paths)}
+        if (self._filepath / MANIFEST_FILE).exists():
+            paths_dict = {
+                k: self._get_location(entry)
+                for k, entry in self._read_manifest().items()
+            }
+        elif self._filepath.exists() and not self._n_partitions:
+            paths_dict = self._scan_files()
         else:
             paths_dict = {}
 
-        return self.folder_data_object(paths_dict, lazy=self._lazy)
+        return self.folder_data_object(
+            paths_dict,
+            lazy=self._lazy,
+            load_args=self._load_args,
+            workers=self._workers,
+            cache_size=self._cache_size,
+        )
 
     def _save(self, data: Dict[Any, Any]) -> None:
-        os.makedirs(self._filepath, exist_ok=True)
-        paths_dict = {
-            k: self._filepath / f"{k}_{self._suffix}.{self._format}"
-            for k in data.keys()
-        }
+        """
+        Saves all ids in ``overwrite`` mode. In ``upsert`` mode, only ids that are
+        new or whose content hash changed are written
+        """
 
+        os.makedirs(self._filepath, exist_ok=True)
+        paths_dict = {k: self._get_path(k) for k in data.keys()}
         data_folder_object = self._get_folder_data_object()(
-            paths_dict=paths_dict, data=data
+            paths_dict=paths_dict, data=data, workers=self._workers
         )
-        data_folder_object.save(**self._save_args)
+        manifest = self._read_manifest()
+
+        hashes = {}
+        if self._save_mode == "upsert":
+            contents = data_folder_object.dumps(**self._save_args)
+            hashes = {k: _hash(content) for k, content in contents.items()}
+            contents = {
+                k: content
+                for k, content in contents.items()
+                if hashes[k] != self._get_hash(manifest.get(str(k)))
+            }
+            logging.getLogger(__name__).info(
+                f"{self._filepath}: {len(contents)} new or changed ids, "
+                + f"{len(data) - len(contents)} unchanged"
+            )
+            if self._n_partitions:
+                locations = data_folder_object.save_packed(contents)
+            else:
+                data_folder_object.save_contents(contents)
+                locations = {k: paths_dict[k] for k in contents.keys()}
+        elif self._n_partitions:
+            # Packs are rewritten with the new ids and the ones they already held
+            contents = data_folder_object.dumps(**self._save_args)
+            hashes = {k: _hash(content) for k, content in contents.items()}
+            packs = {paths_dict[k].name for k in data.keys()}
+            kept = self._get_packed(manifest, packs, exclude={str(k) for k in data})
+            hashes.update({k: manifest[k]["hash"] for k in kept.keys()})
+            locations = data_folder_object.save_packed(contents, kept=kept)
+        else:
+            data_folder_object.save(**self._save_args)
+            locations = paths_dict
+
+        for k, location in locations.items():
+            manifest[str(k)] = self._get_manifest_entry(location, hashes.get(k))
+        if self._save_mode == "upsert" and self._n_partitions:
+            self._compact(manifest, data_folder_object)
+        self._write_manifest(manifest)
+
+    def _compact(self, manifest: Dict[str, Dict[str, Any]], folder_data: FolderData):
+        """
+        Rewrites the packs in which replaced copies of ids take most of the space,
+        updating the manifest with the new location of their ids
+        """
+
+        live_sizes = defaultdict(int)
+        for entry in manifest.values():
+            if entry["offset"] is not None:
+                live_sizes[entry["path"]] += entry["size"]
+        packs = {
+            pack
+            for pack, size in live_sizes.items()
+            if size < COMPACTION_RATIO * os.path.getsize(self._filepath / pack)
+        }
+        if not packs:
+            return
+        kept = self._get_packed(manifest, packs)
+        for k, location in folder_data.save_packed({}, kept=kept).items():
+            manifest[k] = self._get_manifest_entry(location, manifest[k]["hash"])
+
+    def _get_packed(
+        self,
+        manifest: Dict[str, Dict[str, Any]],
+        packs: Set[str],
+        exclude: Set[str] = frozenset(),
+    ) -> Dict[str, PackedLocation]:
+        """Location of the ids in some packs, except the excluded ones"""
+
+        return {
+            k: self._get_location(entry)
+            for k, entry in manifest.items()
+            if entry["path"] in packs
+            and entry["offset"] is not None
+            and k not in exclude
+        }
 
     def _exists(self) -> bool:
         return Path(self._filepath).exists()
@@ -79,3 +204,83 @@ class FolderDataDataset(AbstractDataSet):
             return DATA_FOLDER_OBJECTS[self._format]
         else:
             raise ValueError(f"{self._filepath} is not a valid format")
+
+    def _get_path(self, k: Any) -> Path:
+        if self._n_partitions:
+            partition = zlib.crc32(str(k).encode("utf-8")) % self._n_partitions
+            return self._filepath / f"{partition}_{self._suffix}.{self._format}pack"
+        return self._filepath / f"{k}_{self._suffix}.{self._format}"
+
+    def _get_location(self, entry: Dict[str, Any]):
+        path = self._filepath / entry["path"]
+        if entry["offset"] is None:
+            return path
+        return PackedLocation(path, entry["offset"], entry["size"])
+
+    def _get_hash(self, entry: Dict[str, Any]):
+        """Hash of the content of an id, computed from its file if unknown"""
+
+        if not entry:
+            return None
+        if entry["hash"] is None:
+            location = self._get_location(entry)
+            if isinstance(location, PackedLocation):
+                entry["hash"] = _hash(FolderData._read_bytes(location))
+            elif location.exists():
+                entry["hash"] = _hash(location.read_bytes())
+        return entry["hash"]
+
+    @staticmethod
+    def _get_manifest_entry(location, content_hash: str = None) -> Dict[str, Any]:
+        if isinstance(location, PackedLocation):
+            path, offset, size = location
+        else:
+            path, offset, size = location, None, os.path.getsize(location)
+        return {
+            "path": Path(path).name,
+            "offset": offset,
+            "size": size,
+            "hash": content_hash,
+            "mtime": os.path.getmtime(path),
+        }
+
+    def _scan_files(self) -> Dict[str, Path]:
+        """Explores directory to find the file of every id"""
+
+        files_in_path = os.listdir(self._filepath)
+        files_in_path = [
+            file
+            for file in files_in_path
+            if f".{self._format}" in file and not file.startswith("_")
+        ]
+        full_paths = [self._filepath / file for file in files_in_path]
+        ids = [file.split(f"_{self._suffix}")[0] for file in files_in_path]
+        return {k: v for k, v in zip(ids, full_paths)}
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Reads the manifest. If there is none yet, it is built from the files
+        already in the folder
+        """
+
+        manifest_path = self._filepath / MANIFEST_FILE
+        if manifest_path.exists():
+            with open(manifest_path) as file:
+                return json.load(file)
+        if self._filepath.exists() and not self._n_partitions:
+            return {
+                k: self._get_manifest_entry(path)
+                for k, path in self._scan_files().items()
+            }
+        return {}
+
+    def _write_manifest(self, manifest: Dict[str, Dict[str, Any]]):
+        manifest_path = self._filepath / MANIFEST_FILE
+        tmp_path = self._filepath / f"{MANIFEST_FILE}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, manifest_path)
+
+
+def _hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
@@ -1,32 +1,177 @@
-from typing import Iterable, List, Union
+import logging
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Tuple, Union
 
 import pymongo
-from kedro.io import AbstractDataSet
+from kedro.io import AbstractDataSet, DataSetError
+from pymongo import ReplaceOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+DEFAULT_SAVE_ARGS = {"batch_size": 1000, "ordered": False}
+
+
+class LazyCollection:
+    """
+    Re-iterable view over the documents of a collection matching a query. Every
+    iteration opens a new pymongo cursor, so documents are fetched in batches and
+    never held in memory all at once
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        query: dict = None,
+        projection: dict = None,
+        batch_size: int = None,
+        sort: List[Tuple[str, int]] = None,
+        limit: int = None,
+    ):
+        self._collection = collection
+        self._query = query if query else {}
+        self._projection = projection
+        self._batch_size = batch_size
+        self._sort = [tuple(pair) for pair in sort] if sort else None
+        self._limit = limit
+
+    def filter(self, query: dict) -> "LazyCollection":
+        """
+        Narrows down the documents of the view. The query is pushed down to MongoDB,
+        before the sort and limit of the view
+
+        :param query: MongoDB query
+
+        :return: new view matching both the current and the given query
+        """
+
+        query = {"$and": [self._query, query]} if self._query else query
+        return LazyCollection(
+            self._collection,
+            query,
+            self._projection,
+            self._batch_size,
+            self._sort,
+            self._limit,
+        )
+
+    def __iter__(self) -> Iterator[dict]:
+        cursor = self._collection.find(self._query, self._projection)
+        if self._sort:
+            cursor = cursor.sort(self._sort)
+        if self._limit:
+            cursor = cursor.limit(self._limit)
+        if self._batch_size:
+            cursor = cursor.batch_size(self._batch_size)
+        return iter(cursor)
+
+    def __len__(self) -> int:
+        if self._limit:
+            return self._collection.count_documents(self._query, limit=self._limit)
+        return self._collection.count_documents(self._query)
 
 
 class MongoDataSet(AbstractDataSet):
     """Handles i/o for data that is split into files inside of a folder"""
 
-    def __init__(self, address: str, database_name: str, collection_name: str):
+    def __init__(
+        self,
+        address: str,
+        database_name: str,
+        collection_name: str,
+        load_args: dict = None,
+        save_args: dict = None,
+    ):
+        """
+        :param address: MongoDB address
+        :param database_name: name of the database
+        :param collection_name: name of the collection
+        :param load_args: query options, pushed down to MongoDB. ``query`` filters
+            documents, ``projection`` selects their fields, ``distinct`` loads only
+            the distinct values of a field instead of documents, ``sort`` is a list of
+            [field, direction] pairs, ``limit`` caps the number of documents and
+            ``batch_size`` sets the number of documents per cursor batch. If
+            ``lazy`` is set, a re-iterable ``LazyCollection`` with the same options
+            is loaded instead of a list
+        :param save_args: upsert options. ``batch_size`` is the number of documents
+            sent in each bulk write, and ``ordered`` whether a batch stops at the
+            first failed document
+        """
+
         self._address = address
         self._database_name = database_name
         self._collection_name = collection_name
         self._connection = pymongo.MongoClient(address)[database_name][collection_name]
+        self._load_args = load_args if load_args else {}
+        self._save_args = {**DEFAULT_SAVE_ARGS, **(save_args if save_args else {})}
 
-    def _load(self, query: dict = None) -> List[dict]:
-        query = query if query else {}
-        data = self._connection.find(query)
-        data = [doc for doc in data]
-        return data
+    def _load(self, query: dict = None) -> Union[List[Any], LazyCollection]:
+        query = query if query else self._load_args.get("query", {})
+        if self._load_args.get("distinct"):
+            return self._connection.distinct(self._load_args["distinct"], query)
+        documents = LazyCollection(
+            self._connection,
+            query,
+            self._load_args.get("projection"),
+            self._load_args.get("batch_size"),
+            self._load_args.get("sort"),
+            self._load_args.get("limit"),
+        )
+        if self._load_args.get("lazy"):
+            return documents
+        # Iterated explicitly, since list() would count the documents as size hint
+        return list(iter(documents))
 
     def _save(self, data: Union[Iterable[dict], dict]) -> None:
         if isinstance(data, dict):
-            self._connection.replace_one({"_id": data["_id"]}, data, upsert=True)
-        elif isinstance(data, list):
-            for doc in data:
-                self._connection.replace_one({"_id": doc["_id"]}, doc, upsert=True)
-        else:
-            raise ValueError("Data must be a `dict` or a `list` of `dict`")
+            data = [data]
+        elif isinstance(data, str) or not isinstance(data, Iterable):
+            raise ValueError("Data must be a `dict` or an iterable of `dict`")
+
+        logger = logging.getLogger(__name__)
+        docs = iter(data)
+        n_written, n_failed = 0, 0
+        while True:
+            batch = list(islice(docs, self._save_args["batch_size"]))
+            if not batch:
+                break
+            written, failed = self._upsert_batch(batch)
+            n_written += written
+            n_failed += failed
+            logger.info(
+                f"{self._collection_name}: {written} documents written, "
+                + f"{failed} failed"
+            )
+
+        if n_failed:
+            raise DataSetError(
+                f"{n_failed} documents failed to be written to {self._describe()} "
+                + f"({n_written} written)"
+            )
+
+    def _upsert_batch(self, batch: List[dict]) -> Tuple[int, int]:
+        """
+        Upserts a batch of documents in a single bulk write
+
+        :param batch: documents to upsert
+
+        :return: number of documents written and failed
+        """
+
+        requests = [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch]
+        try:
+            result = self._connection.bulk_write(
+                requests, ordered=self._save_args["ordered"]
+            )
+            written = result.upserted_count + result.matched_count
+        except BulkWriteError as error:
+            details = error.details
+            written = details["nUpserted"] + details["nMatched"]
+            errors = details["writeErrors"]
+            logging.getLogger(__name__).warning(
+                f"{self._collection_name}: bulk write failed, first error: "
+                + (errors[0]["errmsg"] if errors else str(error))
+            )
+        return written, len(batch) - written
 
     def _exists(self) -> bool:
         pass
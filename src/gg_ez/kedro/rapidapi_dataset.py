@@ -1,5 +1,6 @@
 from kedro.io import AbstractDataSet
 
+from gg_ez.api.cache import ResponseCache
 from gg_ez.api.connector import RapidApiConnector
 from gg_ez.api.handlers import JSONHandler
 
@@ -7,10 +8,20 @@ from gg_ez.api.handlers import JSONHandler
 class RapidAPIDataSet(AbstractDataSet):
     """Handles i/o for data that is split into files inside of a folder"""
 
-    def __init__(self, credentials: dict):
-        self._handler = JSONHandler(RapidApiConnector(credentials["token"]))
+    def __init__(
+        self, credentials: dict, connector_args: dict = None, cache_args: dict = None
+    ):
+        connector_args = connector_args if connector_args else {}
+        cache = ResponseCache(**cache_args) if cache_args else None
+        self._handler = JSONHandler(
+            RapidApiConnector(credentials["token"], **connector_args), cache=cache
+        )
 
     def _load(self) -> callable:
+        """
+        Returns `JSONHandler.get_json`. Nodes can stream the records of a response
+        with ``rapidapi(path, subset=[...], stream=True)``
+        """
         return self._handler.get_json
 
     def _save(self, data):
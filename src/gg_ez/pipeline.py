@@ -27,6 +27,12 @@ def create_pipelines(**kwargs) -> Dict[str, Pipeline]:
     preprocess_players_fixtures = (
         pre_process.create_pipeline_preprocess_players_fixtures()
     )
+    preprocess_fixtures_leagues_incremental = (
+        pre_process.create_pipeline_preprocess_fixtures_leagues_incremental()
+    )
+    preprocess_players_fixtures_incremental = (
+        pre_process.create_pipeline_preprocess_players_fixtures_incremental()
+    )
 
     return {
         "fetch-leagues": fetch_leagues_pipeline,
@@ -41,6 +47,13 @@ def create_pipelines(**kwargs) -> Dict[str, Pipeline]:
             + preprocess_fixtures_leagues
             + preprocess_players_fixtures
         ),
+        "pre-process-games-incremental": preprocess_fixtures_leagues_incremental,
+        "pre-process-players-incremental": preprocess_players_fixtures_incremental,
+        "pre-process-all-incremental": (
+            preprocess_leagues
+            + preprocess_fixtures_leagues_incremental
+            + preprocess_players_fixtures_incremental
+        ),
         "__default__": (
             fetch_leagues_pipeline
             + fetch_games_pipeline
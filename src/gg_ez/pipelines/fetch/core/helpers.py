@@ -1,9 +1,15 @@
-from typing import List
+import hashlib
+import json
+from typing import Any, Iterable, List, Set
 
 import pandas as pd
 
+from gg_ez.api.rate_limiter import RateLimiter
 from gg_ez.pipelines.pre_process.core.league import leagues_dict2df
 
+# Fields added to documents when they are fetched
+FETCH_FIELDS = ("_id", "fetch_time", "content_hash")
+
 
 def get_league_ids(
     leagues: List[dict],
@@ -35,10 +41,80 @@ def get_league_ids(
     return league_ids
 
 
-def get_finished_fixtures(fixtures_in_league):
+def get_finished_league_ids(leagues: List[dict]) -> Set[int]:
+    """
+    Gets ids of leagues whose season is over, so their fixtures won't change
+
+    :param leagues: all leagues info
+
+    :return: set of league ids
+    """
+
+    return {league["league_id"] for league in leagues if not league["is_current"]}
+
+
+def get_ids(records: List[Any], key: str) -> Set[str]:
+    """
+    Gets the set of ids found in a list of records
+
+    :param records: either documents containing ``key``, or the ids themselves (as
+        loaded by a dataset with ``distinct`` load args)
+    :param key: name of the id field
+
+    :return: set of ids, as strings
+    """
+
+    return {
+        str(record[key]) if isinstance(record, dict) else str(record)
+        for record in records
+    }
+
+
+def get_content_hash(document: dict) -> str:
+    """
+    Hashes a fetched document, ignoring the fields added when fetching it
+
+    :param document: document as returned by the API
+
+    :return: sha1 of its content
+    """
+
+    content = {k: v for k, v in document.items() if k not in FETCH_FIELDS}
+    content = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def get_finished_fixtures(fixtures_in_league: Iterable[dict]) -> List[str]:
+    """
+    Gets ids of finished fixtures
+
+    :param fixtures_in_league: fixtures of a league, e.g. streamed from the API
+
+    :return: list of fixture ids, as strings
+    """
+
     finshed_fistures = [
         str(x["fixture_id"])
-        for x in fixtures_in_league["api"]["fixtures"]
+        for x in fixtures_in_league
         if x["status"] == "Match Finished"
     ]
     return finshed_fistures
+
+
+def get_rate_limiter(sleep: float = None, rate_limit: dict = None) -> RateLimiter:
+    """
+    Builds the rate limiter shared by all API calls of a node
+
+    :param sleep: legacy sleep time between calls. Only used if ``rate_limit`` is
+        not given, and translated into a quota of ``1 / sleep`` calls per second
+    :param rate_limit: API quotas, with optional keys ``per_second``, ``per_day``
+        and ``usage_file``, see `RateLimiter`
+
+    :return: rate limiter
+    """
+
+    if rate_limit:
+        return RateLimiter(**rate_limit)
+    if sleep:
+        return RateLimiter(per_second=1 / sleep)
+    return RateLimiter()
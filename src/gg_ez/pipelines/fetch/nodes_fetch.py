@@ -1,9 +1,17 @@
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from typing import List
 
-from gg_ez.pipelines.fetch.core.helpers import get_finished_fixtures, get_league_ids
+from gg_ez.pipelines.fetch.core.helpers import (
+    get_content_hash,
+    get_finished_fixtures,
+    get_finished_league_ids,
+    get_ids,
+    get_league_ids,
+    get_rate_limiter,
+)
 from gg_ez.pipelines.fetch.core.player_fixture import fetch_player_stats_in_fixture
 
 
@@ -29,34 +37,53 @@ def fetch_games(
     valid_leagues: List[List[str]],
     only_current: bool = False,
     sleep: float = None,
+    existing_games: List[dict] = None,
 ) -> List[dict]:
     """
-    Fetches all games in selected leagues
+    Fetches all games in selected leagues. Only games that are new or whose content
+    changed are returned, stamped with their ``fetch_time``
 
     :param rapidapi: fetch function for RapidAPI
     :param leagues_raw:
     :param valid_leagues: list of leagues to consider. Each element of the list is a
         list with [{country}, {name}] wich needs to match the ``leagues`` table
     :param only_current: only download games from current year
-    :param sleep: sleep time between calls
+    :param sleep: sleep time between calls. Responses served from cache don't wait
+    :param existing_games: fetched games, or just their ``_id`` and ``content_hash``
 
     :return:
     """
 
     logger = logging.getLogger(__name__)
+    rapidapi = partial(rapidapi, rate_limiter=get_rate_limiter(sleep))
+    existing_hashes = {
+        str(game["_id"]): game.get("content_hash") for game in existing_games or []
+    }
     league_ids = get_league_ids(leagues_raw, valid_leagues, only_current)
+    finished_league_ids = get_finished_league_ids(leagues_raw)
 
     logger.info(f"Fetching game info: {len(league_ids)} leagues")
     all_games = []
+    n_unchanged = 0
     for league_id in league_ids:
         logger.info(f"Fetching games info for league: {league_id}")
-        games = rapidapi(f"fixtures/league/{league_id}")
-        games = games["api"]["fixtures"]
+        games = rapidapi(
+            f"fixtures/league/{league_id}",
+            immutable=league_id in finished_league_ids,
+            subset=["api", "fixtures"],
+            stream=True,
+        )
+        fetch_time = datetime.now()
         for game in games:
             game["_id"] = game["fixture_id"]
+            game["content_hash"] = get_content_hash(game)
+            if existing_hashes.get(str(game["_id"])) == game["content_hash"]:
+                n_unchanged += 1
+                continue
+            game["fetch_time"] = fetch_time
             all_games.append(game)
-        time.sleep(sleep)
 
+    logger.info(f"{len(all_games)} new or changed games, {n_unchanged} unchanged")
     return all_games
 
 
@@ -68,44 +95,55 @@ def fetch_player_stats_in_leagues(
     valid_leagues: List[List[str]],
     only_current: bool = False,
     sleep: float = None,
+    n_threads: int = 1,
+    rate_limit: dict = None,
 ):
     """
     For a given league, fetches stats of all games at player level
 
     :param rapidapi: fetch function for RapidAPI
-    :param existing_player_stats:
+    :param existing_player_stats: downloaded player stats, or their ``event_id``
     :param leagues:
-    :param empty_games:
+    :param empty_games: fixtures fetched but empty, or their ``_id``
     :param valid_leagues: list of leagues to consider. Each element of the list is a
         list with [{country}, {name}] wich needs to match the ``leagues`` table
     :param only_current: only download games from current year
-    :param sleep: sleep time between calls
+    :param sleep: sleep time between calls. Ignored if ``rate_limit`` is given
+    :param n_threads: number of fixtures to download concurrently
+    :param rate_limit: API quotas shared by all threads, with optional keys
+        ``per_second``, ``per_day`` and ``usage_file`` (to share the per-day quota
+        across runs). Responses served from cache don't count
 
     :return:
     """
 
     logger = logging.getLogger(__name__)
+    rapidapi = partial(rapidapi, rate_limiter=get_rate_limiter(sleep, rate_limit))
 
     # Get league_ids of all leagues to download stats from
     league_ids = get_league_ids(
         leagues, valid_leagues, only_current, fixtures_players_statistics=True
     )
+    finished_league_ids = get_finished_league_ids(leagues)
     logger.info(f"{len(league_ids)} leagues will be checked")
 
     # Identify all games that have finished in those leagues
     finished_fixtures = []
     for league_id in league_ids:
         logger.info(f"Exploring league_id: {league_id}")
-        fixtures_in_league = rapidapi(f"fixtures/league/{league_id}")
+        fixtures_in_league = rapidapi(
+            f"fixtures/league/{league_id}",
+            immutable=league_id in finished_league_ids,
+            subset=["api", "fixtures"],
+            stream=True,
+        )
         finished_fixtures += get_finished_fixtures(fixtures_in_league)
-        if sleep:
-            time.sleep(sleep)
 
     finished_fixtures = set(finished_fixtures)
 
     # Identify finished games not downloaded
-    existing_stats = set([str(stat["event_id"]) for stat in existing_player_stats])
-    empty_game_ids = {game["_id"] for game in empty_games}
+    existing_stats = get_ids(existing_player_stats, "event_id")
+    empty_game_ids = get_ids(empty_games, "_id")
     finished_fixtures_not_downloaded = finished_fixtures - existing_stats
     finished_fixtures_not_downloaded = finished_fixtures_not_downloaded - empty_game_ids
 
@@ -116,19 +154,25 @@ def fetch_player_stats_in_leagues(
     # Download games
     all_stats = []
     all_empty_stats = []
-    for fixture_id in list(finished_fixtures_not_downloaded)[0:70000]:
-        game = fetch_player_stats_in_fixture(rapidapi, fixture_id)
-        if game["api"]["results"] > 0:
-            for player in game["api"]["players"]:
-                player["_id"] = f"{player['player_id']}_{player['event_id']}"
-                all_stats.append(player)
-        else:
-            logger.warning(
-                f"Fixture {fixture_id} fetched, but empty. Logging and skipping..."
-            )
-            all_empty_stats.append({"_id": fixture_id, "fetch_time": datetime.now()})
-
-        if sleep:
-            time.sleep(sleep)
+    fixture_ids = list(finished_fixtures_not_downloaded)[0:70000]
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        games = executor.map(
+            lambda fixture_id: fetch_player_stats_in_fixture(rapidapi, fixture_id),
+            fixture_ids,
+        )
+        for fixture_id, game in zip(fixture_ids, games):
+            if game["api"]["results"] > 0:
+                fetch_time = datetime.now()
+                for player in game["api"]["players"]:
+                    player["_id"] = f"{player['player_id']}_{player['event_id']}"
+                    player["fetch_time"] = fetch_time
+                    all_stats.append(player)
+            else:
+                logger.warning(
+                    f"Fixture {fixture_id} fetched, but empty. Logging and skipping..."
+                )
+                all_empty_stats.append(
+                    {"_id": fixture_id, "fetch_time": datetime.now()}
+                )
 
     return all_stats, all_empty_stats
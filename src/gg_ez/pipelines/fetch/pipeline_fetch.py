@@ -18,6 +18,7 @@ def create_pipeline_fetch_games(**kwargs):
                     "params:leagues",
                     "params:only_current",
                     "params:sleep",
+                    "fixtures_check_existing",
                 ],
                 "games_raw",
             ),
@@ -38,6 +39,8 @@ def create_pipeline_player_stats(**kwargs):
                     "params:leagues",
                     "params:only_current",
                     "params:sleep",
+                    "params:n_threads",
+                    "params:rate_limit",
                 ],
                 ["players", "empty_games"],
             ),
@@ -1,11 +1,15 @@
 __all__ = [
     "create_pipeline_preprocess_fixtures_leagues",
+    "create_pipeline_preprocess_fixtures_leagues_incremental",
     "create_pipeline_preprocess_leagues",
     "create_pipeline_preprocess_players_fixtures",
+    "create_pipeline_preprocess_players_fixtures_incremental",
 ]
 
 from .pipeline_pre_process import (
     create_pipeline_preprocess_fixtures_leagues,
+    create_pipeline_preprocess_fixtures_leagues_incremental,
     create_pipeline_preprocess_leagues,
     create_pipeline_preprocess_players_fixtures,
+    create_pipeline_preprocess_players_fixtures_incremental,
 )
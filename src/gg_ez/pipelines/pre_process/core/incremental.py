@@ -0,0 +1,39 @@
+from typing import Any, Iterable, List
+
+from gg_ez.kedro.mongo_dataset import LazyCollection
+
+
+def get_high_water_mark(processed: List[dict], key: str = "fetch_time") -> Any:
+    """
+    Gets the latest value of a field among already processed documents
+
+    :param processed: processed documents. Loading only the latest one is enough
+    :param key: field tracking when documents were fetched
+
+    :return: high-water mark, ``None`` if nothing has been processed yet
+    """
+
+    marks = [doc[key] for doc in processed if doc.get(key) is not None]
+    return max(marks, default=None)
+
+
+def filter_new_documents(
+    documents: Iterable[dict], processed: List[dict], key: str = "fetch_time"
+) -> Iterable[dict]:
+    """
+    Keeps only documents fetched after the high-water mark of processed documents
+
+    :param documents: raw documents. If a ``LazyCollection`` is given, the filter
+        is pushed down to MongoDB
+    :param processed: processed documents
+    :param key: field tracking when documents were fetched
+
+    :return: new or re-fetched documents
+    """
+
+    mark = get_high_water_mark(processed, key)
+    if mark is None:
+        return documents
+    if isinstance(documents, LazyCollection):
+        return documents.filter({key: {"$gt": mark}})
+    return [doc for doc in documents if doc.get(key) is not None and doc[key] > mark]
@@ -1,9 +1,14 @@
-from typing import Any, List
+from typing import Any, Callable, Iterable, List
 
 import numpy as np
 
-from gg_ez.utilities.dict import flatten_dict
-from gg_ez.utilities.processing import apply_multiprocessing
+from gg_ez.pipelines.pre_process.core.incremental import filter_new_documents
+from gg_ez.utilities.dict import DictFlattener, flatten_dict
+from gg_ez.utilities.processing import apply_multiprocessing, iapply_multiprocessing
+
+# Compiled from the first player seen by each process, and again from a later one
+# if many players in a row stop matching it
+_PLAYER_FLATTENER = DictFlattener()
 
 
 def pre_process_leagues(leagues: List[dict]) -> List[dict]:
@@ -21,39 +26,100 @@ def pre_process_leagues(leagues: List[dict]) -> List[dict]:
     return flatten_leagues
 
 
-def pre_process_fixtures(fixtures: List[dict], n_cores: int = 1) -> List[dict]:
+def pre_process_fixtures(
+    fixtures: Iterable[dict], n_cores: int = 1
+) -> Iterable[dict]:
     """
     Pre-processes fixtures into flatten distionaries that can rapidly be casted
     to pd.DataFrame
 
-    :param fixtures: raw fixtures info
+    :param fixtures: raw fixtures info. If not a list (e.g. a lazy collection),
+        fixtures are processed and returned as a stream
     :param n_cores: number of corres in multi-processing
 
     :return: processed fixtures
     """
 
-    processed_fixtures = apply_multiprocessing(flatten_dict, fixtures, n_cores=n_cores)
+    processed_fixtures = _apply(DictFlattener(), fixtures, n_cores=n_cores)
 
     return processed_fixtures
 
 
-def pre_process_players(players: List[dict], n_cores: int = 1) -> List[dict]:
+def pre_process_players(players: Iterable[dict], n_cores: int = 1) -> Iterable[dict]:
     """
     Pre-processes fixtures into flatten distionaries that can rapidly be casted
     to pd.DataFrame
 
-    :param players: raw players stats
+    :param players: raw players stats. If not a list (e.g. a lazy collection),
+        players are processed and returned as a stream
     :param n_cores: number of corres in multi-processing
 
     :return: processed players
     """
 
-    processed_players = apply_multiprocessing(flatten_dict, players, n_cores=n_cores)
-    for player in processed_players:
-        player["rating"] = to_float(player["rating"])
+    processed_players = _apply(pre_process_player, players, n_cores=n_cores)
+
     return processed_players
 
 
+def pre_process_fixtures_incremental(
+    fixtures: Iterable[dict], fixtures_latest: List[dict], n_cores: int = 1
+) -> Iterable[dict]:
+    """
+    Pre-processes only fixtures fetched since the last run
+
+    :param fixtures: raw fixtures info
+    :param fixtures_latest: latest processed fixture, used as high-water mark
+    :param n_cores: number of corres in multi-processing
+
+    :return: processed fixtures
+    """
+
+    new_fixtures = filter_new_documents(fixtures, fixtures_latest)
+
+    return pre_process_fixtures(new_fixtures, n_cores=n_cores)
+
+
+def pre_process_players_incremental(
+    players: Iterable[dict], players_latest: List[dict], n_cores: int = 1
+) -> Iterable[dict]:
+    """
+    Pre-processes only player stats fetched since the last run
+
+    :param players: raw players stats
+    :param players_latest: latest processed player stats, used as high-water mark
+    :param n_cores: number of corres in multi-processing
+
+    :return: processed players
+    """
+
+    new_players = filter_new_documents(players, players_latest)
+
+    return pre_process_players(new_players, n_cores=n_cores)
+
+
+def pre_process_player(player: dict) -> dict:
+    """
+    Pre-processes the stats of a player in a fixture into a flatten dictionary
+
+    :param player: raw player stats
+
+    :return: processed player stats
+    """
+
+    processed_player = _PLAYER_FLATTENER(player)
+    processed_player["rating"] = to_float(processed_player["rating"])
+    return processed_player
+
+
+def _apply(fun: Callable, documents: Iterable[dict], n_cores: int) -> Iterable:
+    """Applies a function over all documents, lazily unless they come in a list"""
+
+    if isinstance(documents, list):
+        return apply_multiprocessing(fun, documents, n_cores=n_cores)
+    return iapply_multiprocessing(fun, documents, n_cores=n_cores)
+
+
 def to_float(x: Any) -> float:
     """
     Converts a string to float
@@ -2,8 +2,10 @@ from kedro.pipeline import Pipeline, node
 
 from .nodes_pre_process import (
     pre_process_fixtures,
+    pre_process_fixtures_incremental,
     pre_process_leagues,
     pre_process_players,
+    pre_process_players_incremental,
 )
 
 
@@ -31,3 +33,27 @@ def create_pipeline_preprocess_players_fixtures(**kwargs):
             ),
         ]
     )
+
+
+def create_pipeline_preprocess_fixtures_leagues_incremental(**kwargs):
+    return Pipeline(
+        [
+            node(
+                pre_process_fixtures_incremental,
+                ["games_raw", "games_processed_latest", "params:n_cores"],
+                "games_processed",
+            ),
+        ]
+    )
+
+
+def create_pipeline_preprocess_players_fixtures_incremental(**kwargs):
+    return Pipeline(
+        [
+            node(
+                pre_process_players_incremental,
+                ["players", "players_processed_latest", "params:n_cores"],
+                "players_processed",
+            ),
+        ]
+    )
@@ -1,8 +1,14 @@
-from typing import Any, List
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
 
 import numpy as np
 import pandas as pd
 
+from gg_ez.utilities.folder_data import MANIFEST_FILE, ParquetFolderData
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
 
 def expand_dates(
     df: pd.DataFrame,
@@ -47,56 +53,165 @@ def expand_dates(
     :return: expanded table
     """
 
-    if freq not in ["H", "D"]:
-        raise ValueError(f"got freq={freq}, expected 'H' or 'D'")
+    expansion = _ExpandedDates(df, from_col, to_col, freq, include_last)
+    return expansion.get_rows(df, key_cols, date_col, 0, expansion.n_rows)
 
-    df[from_col] = pd.to_datetime(df[from_col])
-    df[to_col] = pd.to_datetime(df[to_col])
 
-    df["date_to_1"] = df[from_col].dt.date
-    df["date_to_2"] = df[to_col].dt.date
-    df["hour_to_1"] = df[from_col].dt.hour
-    df["n_to_extend"] = df[to_col] - df[from_col]
-    if freq == "H":
-        df["n_to_extend"] = (
-            df["n_to_extend"].dt.seconds / 3600 + df["n_to_extend"].dt.days * 24
-        )
-    else:
-        df["n_to_extend"] = df["n_to_extend"].dt.days
+def iter_expand_dates(
+    df: pd.DataFrame,
+    key_cols: List[Any],
+    from_col: str,
+    to_col: str,
+    date_col: str = "date",
+    freq: str = "D",
+    include_last: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Chunked equivalent of `expand_dates`. Expanded rows are generated in chunks of
+    at most ``chunk_size`` rows, so only one chunk is held in memory at a time. A
+    single from-to range may be split across consecutive chunks. Chunks keep their
+    position in the full expanded table as index
 
-    if include_last:
-        df["n_to_extend"] = df["n_to_extend"] + 1
+    :param df: table to expand
+    :param key_cols: name of columns to keep along with from, to columns
+    :param from_col: name of "from" column
+    :param to_col: name of "to" column
+    :param date_col: name fo resulting date column
+    :param freq: day, hour, etc
+    :param include_last: to_date is included
+    :param chunk_size: maximum number of rows of each chunk
 
-    n_to_extend = list(df["n_to_extend"].values)
-    datetimes_to_1 = list(df[from_col].values)
-    datetimes_to_2 = list(df[to_col].values)
+    :return: generator of expanded chunks
+    """
 
-    cols_to_keep_exp = key_cols + ["date_to_1", "hour_to_1"]
-    data_to_expand_np = df[cols_to_keep_exp].values
+    if chunk_size < 1:
+        raise ValueError(f"got chunk_size={chunk_size}, expected a positive number")
 
-    data_expanded = []
-    for np_element, n_repeat, dt_1, dt_2 in zip(
-        data_to_expand_np, n_to_extend, datetimes_to_1, datetimes_to_2
+    expansion = _ExpandedDates(df, from_col, to_col, freq, include_last)
+    for start in range(0, expansion.n_rows, chunk_size):
+        stop = min(start + chunk_size, expansion.n_rows)
+        yield expansion.get_rows(df, key_cols, date_col, start, stop)
+
+
+def save_expand_dates(
+    df: pd.DataFrame,
+    key_cols: List[Any],
+    from_col: str,
+    to_col: str,
+    filepath: str,
+    suffix: str = "expanded",
+    date_col: str = "date",
+    freq: str = "D",
+    include_last: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    **save_args,
+) -> Dict[int, Path]:
+    """
+    Expands a DataFrame by from-to columns, writing each chunk given by
+    `iter_expand_dates` to its own ``{chunk}_{suffix}.parquet`` file as soon as it
+    is generated. The folder can be read back with a parquet ``FolderDataDataset``.
+    Chunk files of previous runs and the manifest of the folder are removed first,
+    so they can't be mixed up with the new chunks
+
+    :param df: table to expand
+    :param key_cols: name of columns to keep along with from, to columns
+    :param from_col: name of "from" column
+    :param to_col: name of "to" column
+    :param filepath: folder to write the chunks to
+    :param suffix: suffix of the name of the files
+    :param date_col: name fo resulting date column
+    :param freq: day, hour, etc
+    :param include_last: to_date is included
+    :param chunk_size: maximum number of rows of each file
+    :param save_args: arguments passed to `DataFrame.to_parquet`
+
+    :return: path of each chunk
+    """
+
+    filepath = Path(filepath)
+    os.makedirs(filepath, exist_ok=True)
+    for path in filepath.glob(f"*_{suffix}.parquet"):
+        if path.name[: -len(f"_{suffix}.parquet")].isdigit():
+            path.unlink()
+    if (filepath / MANIFEST_FILE).exists():
+        (filepath / MANIFEST_FILE).unlink()
+
+    paths_dict = {}
+    chunks = iter_expand_dates(
+        df, key_cols, from_col, to_col, date_col, freq, include_last, chunk_size
+    )
+    for i, chunk in enumerate(chunks):
+        paths_dict[i] = filepath / f"{i}_{suffix}.parquet"
+        ParquetFolderData({i: paths_dict[i]}, data={i: chunk}).save(**save_args)
+    return paths_dict
+
+
+class _ExpandedDates:
+    """
+    Number of periods of each row of a from-to table, so that any range of rows of
+    the expanded table can be generated without expanding the whole table
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        from_col: str,
+        to_col: str,
+        freq: str,
+        include_last: bool,
     ):
+        if freq not in ["H", "D"]:
+            raise ValueError(f"got freq={freq}, expected 'H' or 'D'")
+
+        self.freq = freq
+        self.step = np.timedelta64(1, "h" if freq == "H" else "D")
+        self.from_dates = pd.to_datetime(df[from_col]).values.astype("datetime64[ns]")
+        to_dates = pd.to_datetime(df[to_col]).values.astype("datetime64[ns]")
+
+        n_to_extend = (to_dates - self.from_dates) // self.step
         if include_last:
-            date_sequence = pd.date_range(dt_1, dt_2, freq=f"1{freq}")
+            n_to_extend = n_to_extend + 1
+        self.n_to_extend = np.clip(n_to_extend, 0, None)
+        self.ends = np.cumsum(self.n_to_extend)
+        self.n_rows = int(self.ends[-1]) if len(self.ends) else 0
+
+    def get_rows(
+        self,
+        df: pd.DataFrame,
+        key_cols: List[Any],
+        date_col: str,
+        start: int,
+        stop: int,
+    ) -> pd.DataFrame:
+        """
+        Generates rows ``start`` to ``stop`` (excluded) of the expanded table
+
+        :param df: table to expand
+        :param key_cols: name of columns to keep
+        :param date_col: name fo resulting date column
+        :param start: first expanded row
+        :param stop: last expanded row, excluded
+
+        :return: expanded rows
+        """
+
+        # Original row of each expanded row, and its position inside of the range.
+        # The whole table repeats every row by its count, while a range of rows has
+        # to find where it starts
+        positions = np.arange(start, stop)
+        if start == 0 and stop == self.n_rows:
+            rows = np.repeat(np.arange(len(self.n_to_extend)), self.n_to_extend)
         else:
-            date_sequence = pd.date_range(dt_1, dt_2, freq=f"1{freq}")[0:-1]
-        date_sequence = np.array(date_sequence).reshape([-1, 1])
+            rows = np.searchsorted(self.ends, positions, side="right")
+        offsets = positions - (self.ends[rows] - self.n_to_extend[rows])
 
-        new_element = np.repeat(np_element.reshape([1, -1]), n_repeat, axis=0)
-        new_element = np.hstack([new_element, date_sequence])
-        data_expanded.append(new_element)
-
-    data_expanded = np.vstack(data_expanded)
-    data_expanded = pd.DataFrame(data_expanded)
-    data_expanded.columns = cols_to_keep_exp + [date_col]
-    data_expanded = data_expanded[key_cols + [date_col]].copy()
+        data_expanded = df[key_cols].iloc[rows].set_axis(
+            pd.RangeIndex(start, stop), axis=0
+        )
+        data_expanded[date_col] = self.from_dates[rows] + offsets * self.step
 
-    if freq == "D":
-        data_expanded[date_col] = pd.to_datetime(data_expanded[date_col])
-        data_expanded[date_col] = data_expanded[date_col].dt.date
-    else:
-        data_expanded[date_col] = pd.to_datetime(data_expanded[date_col])
+        if self.freq == "D":
+            data_expanded[date_col] = data_expanded[date_col].dt.date
 
-    return data_expanded
+        return data_expanded
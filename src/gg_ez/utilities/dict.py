@@ -1,12 +1,227 @@
-import collections
+import collections.abc
+import datetime
+import itertools
+from typing import Any, Dict, Iterable, List, Union
+
+import pandas as pd
 
 
 def flatten_dict(d, parent_key="", sep="_"):
     items = []
     for k, v in d.items():
         new_key = parent_key + sep + k if parent_key else k
-        if isinstance(v, collections.MutableMapping):
+        if isinstance(v, collections.abc.MutableMapping):
             items.extend(flatten_dict(v, new_key, sep=sep).items())
         else:
             items.append((new_key, v))
     return dict(items)
+
+
+def infer_schema(d: dict) -> dict:
+    """
+    Infers the nested structure of a dictionary. Nested dictionaries are kept and
+    any other value is replaced by its type, or `None` for null values
+
+    :param d: sample dictionary
+
+    :return: schema, e.g. ``{"player_id": int, "shots": {"total": int, "on": int}}``
+    """
+
+    return {
+        k: infer_schema(v)
+        if isinstance(v, collections.abc.MutableMapping)
+        else (None if v is None else type(v))
+        for k, v in d.items()
+    }
+
+
+class _SchemaMismatch(Exception):
+    pass
+
+
+# Types of leaves that are never mappings, checked without isinstance
+_SCALAR_TYPES = frozenset(
+    [bool, int, float, str, list, type(None), datetime.date, datetime.datetime]
+)
+
+
+def _check_leaves(values: Iterable):
+    if any(isinstance(value, collections.abc.MutableMapping) for value in values):
+        raise _SchemaMismatch
+
+
+class DictFlattener:
+    """
+    Flattens dictionaries sharing a common structure through key-path accessors
+    compiled once from a schema. Output is the same as `flatten_dict`: dictionaries
+    that don't match the schema fall back to it.
+
+    Leaves are checked not to be nested dictionaries all at once, by their types.
+    If ``max_mismatches`` dictionaries in a row don't match the schema, e.g.
+    because it was inferred from an unusual one, it is inferred again from the last.
+    """
+
+    def __init__(self, schema: dict = None, sep: str = "_", max_mismatches: int = 100):
+        """
+        :param schema: nested structure of the dictionaries, as given by
+            `infer_schema`. If not given, it is inferred from the first dictionary
+        :param sep: separator between nested keys
+        :param max_mismatches: number of consecutive dictionaries not matching the
+            schema after which it is inferred again
+        """
+
+        self.schema = schema
+        self.sep = sep
+        self.max_mismatches = max_mismatches
+        self.keys: List[str] = []
+        self._flatten = None
+        self._values = None
+        self._mismatches = 0
+        if schema is not None:
+            self._compile()
+
+    def __call__(self, d: dict) -> dict:
+        """
+        Flattens a dictionary
+
+        :param d: dictionary to flatten
+
+        :return: flat dictionary
+        """
+
+        if self._flatten is None:
+            self._set_schema(d)
+        try:
+            flat = self._flatten(d)
+        except (_SchemaMismatch, KeyError, TypeError):
+            self._mismatch(d)
+            return flatten_dict(d, sep=self.sep)
+        self._mismatches = 0
+        return flat
+
+    def to_columns(
+        self, dicts: Iterable[dict], as_frame: bool = False
+    ) -> Union[Dict[str, list], pd.DataFrame]:
+        """
+        Flattens dictionaries into columns in a single pass. Keys missing in some of
+        the dictionaries are filled with `None`
+
+        :param dicts: dictionaries to flatten
+        :param as_frame: return a DataFrame instead of a dict of lists
+
+        :return: flattened columns
+        """
+
+        rows = []
+        mismatches = []
+        for d in dicts:
+            if self._values is None:
+                self._set_schema(d)
+            try:
+                rows.append(self._values(d))
+            except (_SchemaMismatch, KeyError, TypeError):
+                mismatches.append((len(rows), flatten_dict(d, sep=self.sep)))
+                rows.append((None,) * len(self.keys))
+
+        if rows:
+            columns = dict(zip(self.keys, map(list, zip(*rows))))
+        else:
+            columns = {k: [] for k in self.keys}
+        for i, flat in mismatches:
+            for k, v in flat.items():
+                if k not in columns:
+                    columns[k] = [None] * len(rows)
+                columns[k][i] = v
+
+        return pd.DataFrame(columns) if as_frame else columns
+
+    def _set_schema(self, d: dict):
+        self.schema = infer_schema(d)
+        self._compile()
+
+    def _mismatch(self, d: dict):
+        self._mismatches += 1
+        if self._mismatches >= self.max_mismatches:
+            self._mismatches = 0
+            self._set_schema(d)
+
+    def _compile(self):
+        """
+        Generates functions returning the flat dictionary and the tuple of leaf
+        values of a dictionary
+        """
+
+        self.keys = []
+        lines = []
+        leaves = []
+        counter = itertools.count()
+
+        def walk(schema: dict, var: str, parent_key: str):
+            lines.append(f"    if len({var}) != {len(schema)}: raise _SchemaMismatch")
+            for k, v in schema.items():
+                new_key = parent_key + self.sep + k if parent_key else k
+                if isinstance(v, dict):
+                    child = f"v{next(counter)}"
+                    lines.append(f"    {child} = {var}[{k!r}]")
+                    walk(v, child, new_key)
+                else:
+                    self.keys.append(new_key)
+                    leaves.append(f"{var}[{k!r}]")
+
+        walk(self.schema, "d", "")
+        items = ", ".join(f"{k!r}: {leaf}" for k, leaf in zip(self.keys, leaves))
+        values = ", ".join(leaves) + ("," if leaves else "")
+        code = "\n".join(
+            ["def flatten(d):"]
+            + lines
+            + [
+                f"    r = {{{items}}}",
+                "    if not _SCALAR_TYPES.issuperset(map(type, r.values())):",
+                "        _check_leaves(r.values())",
+                "    return r",
+                "def values(d):",
+            ]
+            + lines
+            + [
+                f"    r = ({values})",
+                "    if not _SCALAR_TYPES.issuperset(map(type, r)):",
+                "        _check_leaves(r)",
+                "    return r",
+            ]
+        )
+        namespace: Dict[str, Any] = {
+            "_SchemaMismatch": _SchemaMismatch,
+            "_SCALAR_TYPES": _SCALAR_TYPES,
+            "_check_leaves": _check_leaves,
+        }
+        exec(code, namespace)
+        self._flatten = namespace["flatten"]
+        self._values = namespace["values"]
+
+    def __getstate__(self):
+        return {
+            "schema": self.schema,
+            "sep": self.sep,
+            "max_mismatches": self.max_mismatches,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def flatten_dicts(
+    dicts: Iterable[dict], schema: dict = None, sep: str = "_", as_frame: bool = False
+) -> Union[Dict[str, list], pd.DataFrame]:
+    """
+    Columnar, schema-driven equivalent of mapping `flatten_dict` over dictionaries
+
+    :param dicts: dictionaries to flatten
+    :param schema: nested structure of the dictionaries. If not given, it is
+        inferred from the first dictionary
+    :param sep: separator between nested keys
+    :param as_frame: return a DataFrame instead of a dict of lists
+
+    :return: flattened columns
+    """
+
+    return DictFlattener(schema, sep=sep).to_columns(dicts, as_frame=as_frame)
@@ -1,10 +1,22 @@
+import multiprocessing
+import os
 from multiprocessing.dummy import Pool
-from typing import Callable, Union
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 from .decorators import rename
+from .rolling import WINDOW_KERNELS, RollingWindow
+
+ENGINES = ["auto", "shift", "window"]
+BACKENDS = ["threads", "processes"]
+
+# Id mask and columns memory-mapped by each process of the "processes" backend
+_SHARED_MASK: np.ndarray = None
+_SHARED_DATES: np.ndarray = None
+_SHARED_ARRAYS: Dict[str, np.ndarray] = {}
 
 
 def expand_by_period(
@@ -15,17 +27,23 @@ def expand_by_period(
     agg: Union[str, Callable, list, dict],
     suffix: str = "H",
     columns_to_expand: list = None,
-    latest_period_available: int = 0,
+    latest_period_available: Union[int, str] = 0,
     return_only_agg_columns: bool = False,
     n_jobs: int = 1,
     copy: bool = False,
     verbose: bool = False,
+    engine: str = "auto",
+    backend: str = "threads",
+    return_matrix: bool = False,
+    presorted: bool = None,
+    dtype: Union[str, type] = np.float64,
 ):
     """
     Efficient implementation of a process for creating time-wise aggregations
     for a set of variables for each ID
 
-        - The sampling frequency between periods must be constant
+        - The sampling frequency between periods must be constant, unless
+          periods are given as time windows
         - The date variable(s) must be sortable
         - Different IDs can have distinct date ranges
 
@@ -39,7 +57,11 @@ def expand_by_period(
         expanding towards the past while negative ones mean expansions
         towards the future. E.g. periods = [1, 2, 3] means that
         the previous (1), (1,2) and (1,2,3) periods will be aggregated together for
-        producing 3 new columns
+        producing 3 new columns. Periods can also be time windows given as
+        strings, e.g. "30D" aggregates the rows of the last 30 days (including the
+        date of the row) and "-7D" the ones of the next 7 days, however many rows
+        there are. These need a single datetime date column and window kernels, and
+        their columns are named '{agg_column_name}_{agg_name}_{period}'
     :param suffix: suffix to be added to new column names
     :param columns_to_expand: list of columns to process. If not defined, all
         columns will be used. If agg is given a dictionary, this parameter is omitted
@@ -48,23 +70,51 @@ def expand_by_period(
         ggregation(s) will be applied to specified columns. Strings are assumed to be
          numpy functions (i.e. given str 'mean', it is assumed to be np.mean)
     :param latest_period_available: how many periods of lag until date are
-        available (Default = 0)
+        available (Default = 0). For time windows, a time lag such as "1D"
     :param return_only_agg_columns: If `True`, returns only newly created columns
         as a DF. (Default = False)
     :param n_jobs: number of parallel jobs to use to run the process (Default = 1)
     :param copy: if set to True, a copy of the df_raw is made in order to avoid
         modifying the original data by reference (pd.DataFrame)
     :param verbose: (bool)
+    :param engine: "window" computes the aggregations registered in
+        `WINDOW_KERNELS` (given by name or as numpy functions) over windows of rows,
+        in O(n) memory regardless of the largest period and sharing intermediate
+        results across periods. "shift" builds a matrix with a row per shifted
+        period for every column, supporting any aggregation. "auto" uses the window
+        kernels when available and the shift matrix for the rest (Default = "auto")
+    :param backend: how columns are processed when ``n_jobs > 1``. "threads" shares
+        the DataFrame between threads. "processes" memory-maps the sorted numeric
+        columns and the id mask once for a pool of processes, so they are not
+        pickled to every worker. Aggregation functions must then be picklable
+    :param return_matrix: If `True`, the new numeric columns are not attached to the
+        DataFrame but returned as a separate matrix. Non-numeric ones, e.g.
+        datapoints of object columns, are still attached. (Default = False)
+    :param presorted: whether df_raw is already sorted by id asc and date_col desc,
+        skipping the sort. If `None`, it is checked with a linear scan
+        (Default = None)
+    :param dtype: floating point type of numeric columns in the shift matrix and of
+        the new columns. Window kernels compute in float64 and cast their results,
+        so e.g. np.float32 halves memory of the outputs without losing precision in
+        the sums (Default = np.float64)
 
     :returns: DataFrame with new aggregated columns, left joined to the original
     DataFrame. The order of the items in the returned df will be sorted by id asc and
-    date_col desc (i.e. the latest observation will be the first) (pd.DataFrame)
+    date_col desc (i.e. the latest observation will be the first) (pd.DataFrame).
+    Existing columns named as a new one are replaced. If ``return_matrix``, a tuple
+    of the sorted DataFrame, the matrix of new columns aligned with its rows
+    (np.array) and their names (pd.Index)
 
     Example:
         df = expand_by_period_weekly(df, periods=[1, 4, 6, 10], agg={
             'SALARY': [np.mean, 'min', 'max'],
             'SALARY_CNT': 'mean'})
     """
+    if engine not in ENGINES:
+        raise ValueError(f"got engine={engine}, expected one of {ENGINES}")
+    if backend not in BACKENDS:
+        raise ValueError(f"got backend={backend}, expected one of {BACKENDS}")
+
     if not isinstance(agg, dict):
         # Variable agg will be a dict with {'colname':[aggs]}
 
@@ -85,71 +135,311 @@ def expand_by_period(
         # We convert agg to a dictionary for easier processing later on.
         agg = {col: agg for col in columns_to_expand}
 
+    time_periods = [period for period in periods if isinstance(period, str)]
+    if time_periods and len(date_col) != 1:
+        raise ValueError(
+            f"Time windows {time_periods} need a single date column, got {date_col}"
+        )
+    if time_periods and not (
+        isinstance(latest_period_available, str) or latest_period_available == 0
+    ):
+        raise ValueError(
+            "latest_period_available must be a time lag, e.g. '1D', for time windows"
+        )
+    if isinstance(latest_period_available, str) and len(time_periods) < len(periods):
+        raise ValueError(
+            "latest_period_available can only be a time lag if all periods are too"
+        )
+
     # first get a deep copy to avoid overwriting
     df = df_raw.copy() if copy else df_raw
 
     if verbose:
         print("Started expand_by_period.")
 
-    # First sort the df. (about 1 min for a big df)
-    df = df.sort_values(
-        by=id_col + date_col,
-        ascending=[True for _ in id_col] + [False for _ in date_col],
-    )
-    if verbose:
-        print("Sorted df.")
+    # First sort the df, unless it already is. (about 1 min for a big df)
+    ascending = [True for _ in id_col] + [False for _ in date_col]
+    if presorted is None:
+        presorted = _is_sorted(df, id_col + date_col, ascending)
+    if not presorted:
+        df = df.sort_values(by=id_col + date_col, ascending=ascending)
+        if verbose:
+            print("Sorted df.")
 
     # Create a Mask with True values where the IDs change
-    mask = pd.MultiIndex.from_arrays([df[x].values for x in id_col])
-    mask = mask[:-1] != mask[1:]
+    mask = _get_id_mask(df, id_col)
 
     if verbose:
         print("Created the mask for rolling synthetic variable.")
 
+    # Arguments shared by the aggregations of every column
+    aggregation_args = dict(
+        mask=mask,
+        dates=pd.to_datetime(df[date_col[0]]).values if time_periods else None,
+        periods=periods,
+        suffix=suffix,
+        latest_period_available=latest_period_available,
+        verbose=verbose,
+        engine=engine,
+        dtype=dtype,
+    )
     if n_jobs == 1:
         new_features = list(
             map(
                 lambda agg_col, agg_funcs: _generate_feature_aggregations(
-                    df=df,
+                    feature=df[agg_col].values,
                     agg_col=agg_col,
                     agg_funcs=agg_funcs,
-                    mask=mask,
-                    periods=periods,
-                    suffix=suffix,
-                    latest_period_available=latest_period_available,
-                    verbose=verbose,
+                    **aggregation_args,
                 ),
                 list(agg.keys()),
                 list(agg.values()),
             )
         )
+    elif backend == "processes":
+        new_features = _generate_feature_aggregations_in_processes(
+            df=df, agg=agg, n_jobs=n_jobs, **aggregation_args
+        )
     else:
         pool = Pool(n_jobs)
         new_features = pool.map(
             lambda x: _generate_feature_aggregations(
-                df=df,
+                feature=df[x[0]].values,
                 agg_col=x[0],
                 agg_funcs=x[1],
-                mask=mask,
-                periods=periods,
-                suffix=suffix,
-                latest_period_available=latest_period_available,
-                verbose=verbose,
+                **aggregation_args,
             ),
             list(agg.items()),
         )
         pool.close()
         pool.join()
 
+    # Later features replace earlier ones of the same name
     new_features = [feature for sublist in new_features for feature in sublist]
+    new_features = list(dict(new_features).items())
 
-    # tmp is the DataFrame we will create new columns on.
+    # tmp is the DataFrame we will attach the new columns to.
     df_tmp = df.loc[:, id_col + date_col] if return_only_agg_columns else df
-    while len(new_features):
-        name, value = new_features.pop(0)
-        df_tmp[name] = value
+    if return_matrix:
+        numeric = [(n, value) for n, value in new_features if _is_numeric(value)]
+        others = [(n, value) for n, value in new_features if not _is_numeric(value)]
+        matrix, names = _assemble_features(numeric, n_rows=len(df))
+        return _attach_features(df_tmp, others), matrix, names
+
+    return _attach_features(df_tmp, new_features)
+
+
+def update_expand_by_period(
+    df_prev: pd.DataFrame,
+    df_new: pd.DataFrame,
+    id_col: list,
+    date_col: list,
+    periods: list,
+    agg: Union[str, Callable, list, dict],
+    suffix: str = "H",
+    columns_to_expand: list = None,
+    latest_period_available: int = 0,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Incremental version of `expand_by_period`: updates a previously expanded table
+    with new rows, recomputing only the rows whose windows include new data. For
+    every id with new rows, these are the new rows and the ``abs(min(periods))``
+    rows before them, computed along with the ``max(periods) - 1`` rows before
+    those as context. Rows of ids without new data are kept as they are.
+
+    Only periods given as a number of rows are supported, since the rows reached
+    by time windows depend on the dates.
+
+    :param df_prev: DataFrame returned by `expand_by_period`, including the
+        original columns
+    :param df_new: new rows, with the original columns. They replace previous rows
+        of the same id and date
+    :param id_col: name of the column(s) to use as id
+    :param date_col: name of the column(s) to use as time period
+    :param periods: number of periods to aggregate, as used for ``df_prev``
+    :param agg: aggregations, as used for ``df_prev``
+    :param suffix: suffix to be added to new column names
+    :param columns_to_expand: list of columns to process, as used for ``df_prev``
+    :param latest_period_available: how many periods of lag until date are
+        available (Default = 0)
+    :param kwargs: rest of arguments of `expand_by_period`, e.g. ``n_jobs`` or
+        ``engine``
+
+    :return: updated DataFrame, sorted by id asc and date_col desc, where rows keep
+        their index labels from ``df_prev`` or ``df_new`` (pd.DataFrame)
+    """
+
+    time_periods = [period for period in periods if isinstance(period, str)]
+    if time_periods:
+        raise ValueError(
+            f"Time windows {time_periods} can't be updated incrementally, use "
+            + "expand_by_period instead"
+        )
+
+    keys = id_col + date_col
+    ascending = [True for _ in id_col] + [False for _ in date_col]
+    labels = df_prev.index.append(df_new.index)
+    df = pd.concat([df_prev[df_new.columns], df_new], ignore_index=True)
+    is_new = np.arange(len(df)) >= len(df_prev)
+
+    # New rows replace previous rows of the same id and date. The index of the
+    # remaining rows is their position in ``df``
+    df = df[~df.duplicated(subset=keys, keep="last")]
+    df = df.sort_values(by=keys, ascending=ascending, kind="mergesort")
+    is_new = is_new[df.index.values]
+
+    # Position of every row within its id, starting from the latest one
+    groups = np.concatenate(([0], np.cumsum(_get_id_mask(df, id_col))))
+    positions = np.arange(len(df)) - np.searchsorted(groups, groups)
+    oldest_new = (
+        pd.Series(np.where(is_new, positions, -1)).groupby(groups).transform("max")
+    ).values
+
+    # Rows whose windows reach new rows, and the rows their windows reach
+    n_future = abs(min(min(periods), 0))
+    n_past = max(max(periods) - 1, 0)
+    has_new = oldest_new >= 0
+    to_update = has_new & (positions <= oldest_new + n_future)
+    context = has_new & (positions <= oldest_new + n_future + n_past)
+    if not to_update.any():
+        return df_prev
+
+    df_updated = expand_by_period(
+        df[context],
+        id_col=id_col,
+        date_col=date_col,
+        periods=periods,
+        agg=agg,
+        suffix=suffix,
+        columns_to_expand=columns_to_expand,
+        latest_period_available=latest_period_available,
+        **{"presorted": True, **kwargs},
+    )
+    df_updated = df_updated.loc[df[to_update].index]
+    df_updated.index = labels[df_updated.index.values]
+    df_kept = df_prev.iloc[df[~to_update].index.values]
+    df_updated = pd.concat([df_kept, df_updated.reindex(columns=df_prev.columns)])
+    return df_updated.sort_values(by=keys, ascending=ascending, kind="mergesort")
+
+
+def _is_sorted(df: pd.DataFrame, by: list, ascending: list) -> bool:
+    """
+    Checks in a single pass whether a DataFrame is sorted by some columns.
+    Categorical columns are compared by their codes, as sort_values does. Columns
+    with missing or incomparable values are considered unsorted
+
+    :param df: DataFrame to check
+    :param by: names of the columns
+    :param ascending: whether each column is sorted ascending
+
+    :return: whether the DataFrame is sorted
+    """
+
+    # Pairs of consecutive rows equal in all the columns checked so far
+    tied = np.ones(max(len(df) - 1, 0), dtype=bool)
+    for col, asc in zip(by, ascending):
+        values = df[col]
+        if values.isna().any():
+            return False
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.cat.codes
+        previous, current = values.values[:-1], values.values[1:]
+        if not asc:
+            previous, current = current, previous
+        try:
+            if (tied & (previous > current)).any():
+                return False
+        except TypeError:
+            return False
+        tied &= previous == current
+    return True
+
+
+def _get_id_mask(df: pd.DataFrame, id_col: list) -> np.array:
+    """
+    Vector indicating where the id changes between consecutive rows, computed from
+    factorized integer codes of the id columns
+
+    :param df: DataFrame sorted by id
+    :param id_col: name of the column(s) to use as id
+
+    :return: boolean vector with one element less than rows has the DataFrame
+    """
+
+    mask = np.zeros(max(len(df) - 1, 0), dtype=bool)
+    for col in id_col:
+        codes, _ = pd.factorize(df[col])
+        mask |= codes[:-1] != codes[1:]
+    return mask
+
+
+def _assemble_features(
+    new_features: List[Tuple[str, np.array]], n_rows: int
+) -> Tuple[np.array, pd.Index]:
+    """
+    Copies the new features into a single preallocated matrix, column-major so each
+    feature is written contiguously and the matrix becomes a single DataFrame block
 
-    return df_tmp
+    :param new_features: name and values of every feature
+    :param n_rows: number of rows of the sorted dataframe
+
+    :return: matrix with a column per feature, and the name of each column
+    """
+
+    dtypes = [value.dtype for _, value in new_features]
+    dtype = np.result_type(*dtypes) if dtypes else np.float64
+    matrix = np.empty((n_rows, len(new_features)), dtype=dtype, order="F")
+    for i, (_, value) in enumerate(new_features):
+        matrix[:, i] = value
+    return matrix, pd.Index([name for name, _ in new_features])
+
+
+def _attach_features(
+    df: pd.DataFrame, new_features: List[Tuple[str, np.array]]
+) -> pd.DataFrame:
+    """
+    Attaches new features to a DataFrame as a matrix per dtype, so e.g. datapoints
+    of an object column don't turn the numeric features into objects. Existing
+    columns named as a new one are replaced
+
+    :param df: sorted DataFrame
+    :param new_features: name and values of every feature
+
+    :return: DataFrame with the new features as its last columns
+    """
+
+    if not new_features:
+        return df
+    blocks = {}
+    for name, value in new_features:
+        blocks.setdefault(value.dtype, []).append((name, value))
+    df_new = pd.concat(
+        [
+            pd.DataFrame(matrix, index=df.index, columns=names, copy=False)
+            for matrix, names in (
+                _assemble_features(block, n_rows=len(df)) for block in blocks.values()
+            )
+        ],
+        axis=1,
+    )
+    names = [name for name, _ in new_features]
+    if len(blocks) > 1:
+        df_new = df_new[names]
+    df = df.drop(columns=[c for c in names if c in df.columns])
+    return pd.concat([df, df_new], axis=1)
+
+
+def _is_numeric(value: np.array) -> bool:
+    """
+    Whether a feature can be stored in a numeric matrix
+
+    :param value: values of the feature
+
+    :return: whether its dtype is numeric or boolean
+    """
+
+    return np.issubdtype(value.dtype, np.number) or value.dtype == bool
 
 
 @rename("dp")
@@ -165,21 +455,100 @@ def datapoint(x, axis):
     return x[0, :]
 
 
-def _generate_feature_aggregations(
+def _generate_feature_aggregations_in_processes(
     df: pd.DataFrame,
+    agg: dict,
+    n_jobs: int,
+    mask: np.array,
+    dates: np.array = None,
+    **kwargs,
+) -> List[List[Tuple[str, np.array]]]:
+    """
+    Runs `_generate_feature_aggregations` for every column in a pool of processes.
+    The id mask, dates and numeric columns are saved once to memory-mapped files
+    that every process opens, instead of being pickled to each of them. Columns of
+    object dtype can't be memory-mapped and are sent along with their task
+
+    :param df: sorted dataframe
+    :param agg: aggregation functions of each column
+    :param n_jobs: number of processes
+    :param mask: vector indicating where the primary key changes (np.array)
+    :param dates: dates of the rows, needed by time windows (np.array)
+    :param kwargs: rest of arguments of `_generate_feature_aggregations`
+
+    :return: new features of each column
+    """
+
+    with TemporaryDirectory() as folder:
+        mask_path = os.path.join(folder, "mask.npy")
+        np.save(mask_path, np.asarray(mask))
+        dates_path = None
+        if dates is not None:
+            dates_path = os.path.join(folder, "dates.npy")
+            np.save(dates_path, dates)
+        paths = {}
+        for i, col in enumerate(agg.keys()):
+            if not df[col].dtype.hasobject:
+                paths[col] = os.path.join(folder, f"{i}.npy")
+                np.save(paths[col], df[col].values)
+
+        tasks = [
+            (col, None if col in paths else df[col].values, agg_funcs, kwargs)
+            for col, agg_funcs in agg.items()
+        ]
+        with multiprocessing.Pool(
+            n_jobs,
+            initializer=_open_shared_arrays,
+            initargs=(mask_path, dates_path, paths),
+        ) as pool:
+            return pool.starmap(_generate_shared_feature_aggregations, tasks)
+
+
+def _open_shared_arrays(mask_path: str, dates_path: str, paths: Dict[str, str]):
+    """Memory-maps the mask, dates and columns shared with a process of the pool"""
+
+    global _SHARED_MASK, _SHARED_DATES
+    _SHARED_MASK = np.load(mask_path, mmap_mode="r")
+    _SHARED_DATES = np.load(dates_path, mmap_mode="r") if dates_path else None
+    _SHARED_ARRAYS.clear()
+    for col, path in paths.items():
+        _SHARED_ARRAYS[col] = np.load(path, mmap_mode="r")
+
+
+def _generate_shared_feature_aggregations(
+    agg_col: str, feature: Union[np.array, None], agg_funcs: list, kwargs: dict
+) -> List[Tuple[str, np.array]]:
+    """`_generate_feature_aggregations` on the memory-mapped arrays of a process"""
+
+    return _generate_feature_aggregations(
+        feature=_SHARED_ARRAYS[agg_col] if feature is None else feature,
+        agg_col=agg_col,
+        agg_funcs=agg_funcs,
+        mask=_SHARED_MASK,
+        dates=_SHARED_DATES,
+        **kwargs,
+    )
+
+
+def _generate_feature_aggregations(
+    feature: np.array,
     agg_col: str,
     agg_funcs: Union[list, str],
     mask: np.array,
     periods: list,
     suffix: str,
-    latest_period_available: int,
+    latest_period_available: Union[int, str],
     verbose: bool,
+    engine: str = "auto",
+    dates: np.array = None,
+    dtype: Union[str, type] = np.float64,
 ):
     """
-    Given a DataFrame, this function applies the aggregation function specified
+    Given a feature, this function applies the aggregation function specified
     over the periods indicated.
 
-    :param df: dataframe to use as a base for generating the aggregations
+    :param feature: values of the column to aggregate, from the sorted dataframe
+        (np.array)
     :param agg_col: name of the column to aggregate by (str)
     :param agg_funcs: functions to do the aggregations (list or str)
     :param mask: vector indicating where the primary key changes (np.array)
@@ -190,22 +559,45 @@ def _generate_feature_aggregations(
     :param latest_period_available: how many periods of lag until data is
     available (Default = 0) (str)
     :param verbose: indicates if the function must print messages (bool)
+    :param engine: "auto", "shift" or "window", see `expand_by_period`
+    :param dates: dates of the rows, needed by time windows (np.array)
+    :param dtype: floating point type of numeric features, see `expand_by_period`
 
     :return: list of tuples, each of them indicating the name of the feature
     created and the feature itself (list)
     """
-    feat = df[agg_col].values
     aggregations = []
-    shift_matrix = _generate_shift_matrix(feature=feat, mask=mask, periods=periods)
 
     # Lets do the aggregations! =)
     agg_funcs = [agg_funcs] if not isinstance(agg_funcs, list) else agg_funcs
 
-    if verbose:
-        print("Built shifted value matrix for column:", agg_col)
+    # Name of the window kernel of each aggregation, None to use the shift matrix
+    kernels = [
+        None if engine == "shift" else _get_window_kernel(agg_func)
+        for agg_func in agg_funcs
+    ]
+    # Time windows can only be computed by window kernels
+    row_periods = [period for period in periods if not isinstance(period, str)]
+    if (engine == "window" or len(row_periods) < len(periods)) and None in kernels:
+        unsupported = [f for f, kernel in zip(agg_funcs, kernels) if kernel is None]
+        raise ValueError(
+            f"Aggregations {unsupported} of {agg_col} are not supported by the "
+            + f"window engine, expected one of {list(WINDOW_KERNELS)}"
+        )
+
+    if any(kernel is not None for kernel in kernels):
+        rolling_window = RollingWindow(
+            feature=feature, mask=mask, dates=dates, dtype=dtype
+        )
+    if None in kernels:
+        shift_matrix = _generate_shift_matrix(
+            feature=feature, mask=mask, periods=row_periods, dtype=dtype
+        )
+        if verbose:
+            print("Built shifted value matrix for column:", agg_col)
 
     # Do one aggregation at a time!
-    for agg_func in agg_funcs:
+    for agg_func, kernel in zip(agg_funcs, kernels):
 
         # Get agg name string, if supplied a function like np.mean etc.
         agg_name = agg_func if isinstance(agg_func, str) else agg_func.__name__
@@ -215,6 +607,28 @@ def _generate_feature_aggregations(
 
             new_column_name = f"{agg_col}_{agg_name}_{period}{suffix}"
 
+            if isinstance(period, str):
+                new_column_name = f"{agg_col}_{agg_name}_{period}"
+                window = _get_time_window(period, latest_period_available)
+                aggregation = rolling_window.aggregate(kernel, *window)
+                aggregations.append((new_column_name, aggregation))
+                if verbose:
+                    print("Created feature:", new_column_name)
+                continue
+
+            if kernel is not None:
+                # Past windows go from the latest available period to the oldest
+                # one, future windows from the furthest period to the next one
+                if period > 0:
+                    window = (latest_period_available, period - 1)
+                else:
+                    window = (period, -1)
+                aggregation = rolling_window.aggregate(kernel, *window)
+                aggregations.append((new_column_name, aggregation))
+                if verbose:
+                    print("Created feature:", new_column_name)
+                continue
+
             if not callable(agg_func):
                 # it is a string, so assume it is np.xxx function.
                 agg_func = getattr(np, agg_func)
@@ -222,9 +636,10 @@ def _generate_feature_aggregations(
                 aggregation = agg_func(
                     shift_matrix[
                         (
-                            np.abs(np.min([min(periods), 0])) + latest_period_available
+                            np.abs(np.min([min(row_periods), 0]))
+                            + latest_period_available
                         ) : (  # noqa: E203
-                            np.abs(np.min([min(periods), 0])) + period
+                            np.abs(np.min([min(row_periods), 0])) + period
                         ),
                         :,
                     ][::-1],
@@ -235,10 +650,17 @@ def _generate_feature_aggregations(
             else:  # Future
                 aggregation = agg_func(
                     shift_matrix[
-                        (period - min(periods)) : np.abs(min(periods)), :  # noqa: E203
+                        (period - min(row_periods)) : np.abs(  # noqa: E203
+                            min(row_periods)
+                        ),
+                        :,
                     ],
                     axis=0,
                 )
+            # Callables may return other numeric types, e.g. np.count_nonzero ints
+            aggregation = np.asarray(aggregation)
+            if _is_numeric(aggregation):
+                aggregation = aggregation.astype(dtype, copy=False)
             aggregations.append((new_column_name, aggregation))
 
             if verbose:
@@ -247,7 +669,41 @@ def _generate_feature_aggregations(
     return aggregations
 
 
-def _generate_shift_matrix(feature: np.array, mask: np.array, periods: list):
+def _get_time_window(
+    period: str, latest_period_available: Union[int, str]
+) -> Tuple[np.timedelta64, np.timedelta64]:
+    """
+    Time lags from the date of a row delimiting a time window, see `RollingWindow`
+
+    :param period: length of the window, e.g. "30D", negative towards the future
+    :param latest_period_available: time lag until data is available, e.g. "1D"
+
+    :return: start and end of the window
+    """
+
+    duration = pd.Timedelta(period).to_timedelta64()
+    if duration > np.timedelta64(0):
+        return pd.Timedelta(latest_period_available).to_timedelta64(), duration
+    return duration, np.timedelta64(0, "ns")
+
+
+def _get_window_kernel(agg_func: Union[str, Callable]) -> Union[str, None]:
+    """Name of the kernel of an aggregation in `WINDOW_KERNELS`, `None` if missing"""
+
+    if isinstance(agg_func, str):
+        return agg_func if agg_func in WINDOW_KERNELS else None
+    name = getattr(agg_func, "__name__", None)
+    if name in WINDOW_KERNELS and getattr(np, name, None) is agg_func:
+        return name
+    return None
+
+
+def _generate_shift_matrix(
+    feature: np.array,
+    mask: np.array,
+    periods: list,
+    dtype: Union[str, type] = np.float64,
+):
     """
     Generates a matrix with the shift periods needed for building the expanded
     dataframe. This function is called from the expand_by_period function.
@@ -258,6 +714,7 @@ def _generate_shift_matrix(feature: np.array, mask: np.array, periods: list):
     values, indicating if the primary key has
     changed (np.array)
     :param periods: periods to shift by (list)
+    :param dtype: floating point type numeric features are converted to
     :return: matrix with as many rows as the original data has, and (max_period
     - min_period + 1) columns
 
@@ -273,9 +730,10 @@ def _generate_shift_matrix(feature: np.array, mask: np.array, periods: list):
     )
     """
 
-    # We'll convert int types to float, to be able to place np.nan in some cells.
-    if np.issubdtype(feature.dtype, np.integer):
-        feature = feature.astype(np.float)
+    # We'll convert numeric types to float, to be able to place np.nan in some cells.
+    if np.issubdtype(feature.dtype, np.number) or feature.dtype == bool:
+        feature = feature.astype(dtype)
+    nan = np.array([np.nan], dtype=feature.dtype)
 
     feature_original = feature.copy()
 
@@ -293,10 +751,10 @@ def _generate_shift_matrix(feature: np.array, mask: np.array, periods: list):
             feature_new = feature[:-1].copy()
         feature_new[mask] = np.nan  # Apply the mask
         if period >= 0:
-            feature_new = np.hstack((feature_new, [np.nan]))
+            feature_new = np.hstack((feature_new, nan))
             shift_matrix.append(feature_new)
         else:
-            feature_new = np.hstack(([np.nan], feature_new))
+            feature_new = np.hstack((nan, feature_new))
             shift_matrix.insert(0, feature_new)
         feature = feature_new
         del feature_new
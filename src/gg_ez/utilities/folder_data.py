@@ -1,23 +1,77 @@
+import io
+import json
+import os
+import sys
 from abc import abstractmethod
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Union
 
 import pandas as pd
 
 from gg_ez.utilities.io import read_json, save_json
 
+DEFAULT_CACHE_SIZE = 256 * 1024 ** 2
 
-class FolderData:
-    """Handles data that is split into files inside of a folder"""
+# Index of the files of a folder, kept by ``FolderDataDataset``
+MANIFEST_FILE = "_manifest.json"
+
+
+class PackedLocation(NamedTuple):
+    """Location of an entry packed with others inside of a single file"""
+
+    path: Path
+    offset: int
+    size: int
+
+
+class FolderDataError(Exception):
+    """Raised when some of the files of a folder fail to be loaded or saved"""
+
+    def __init__(self, action: str, errors: Dict[Any, Exception]):
+        self.errors = errors
+        details = "; ".join(f"{k}: {error!r}" for k, error in errors.items())
+        super().__init__(f"Failed to {action} {len(errors)} files. {details}")
+
+
+class FolderData(Mapping):
+    """
+    Handles data that is split into files inside of a folder.
+
+    Behaves as a lazy mapping: ``folder_data[k]`` loads only the file of ``k``,
+    keeping recently used entries in an LRU cache, and iterating over ``items()``
+    streams entries one at a time. ``get_data`` loads all the files at once.
+    """
 
     def __init__(
         self,
-        paths_dict: Dict[Any, Path],
+        paths_dict: Dict[Any, Union[Path, PackedLocation]],
         data: Dict[Any, Any] = None,
         lazy: bool = True,
+        load_args: Dict[str, Any] = None,
+        workers: int = 1,
+        cache_size: int = DEFAULT_CACHE_SIZE,
     ):
+        """
+        :param paths_dict: path of the file of each id, or its location inside of a
+            packed file
+        :param data: data of each id
+        :param lazy: delay loading until data is requested
+        :param load_args: arguments passed to the reader of each file
+        :param workers: number of threads loading and saving files concurrently
+        :param cache_size: memory budget (bytes) of entries loaded one at a time
+        """
+
         self.paths_dict = paths_dict
         self._data = data
+        self._load_args = load_args if load_args else {}
+        self._workers = workers
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_sizes = {}
+        self._cached_size = 0
         if not data and not lazy:
             self._load()
 
@@ -26,60 +80,278 @@ class FolderData:
             self._load()
         return self._data
 
-    @abstractmethod
+    def __getitem__(self, k: Any) -> Any:
+        if self._data and k in self._data:
+            return self._data[k]
+        if k in self._cache:
+            self._cache.move_to_end(k)
+            return self._cache[k]
+
+        data = self._read_entry(self.paths_dict[k])
+        self._cache[k] = data
+        self._cache_sizes[k] = _sizeof(data)
+        self._cached_size += self._cache_sizes[k]
+        # Evict least recently used entries, always keeping the latest one
+        while len(self._cache) > 1 and self._cached_size > self._cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._cached_size -= self._cache_sizes.pop(evicted)
+        return data
+
+    def __contains__(self, k: Any) -> bool:
+        return k in self.paths_dict
+
+    def __iter__(self) -> Iterator:
+        return iter(self.paths_dict)
+
+    def __len__(self) -> int:
+        return len(self.paths_dict)
+
+    def save(self, **kwargs):
+        self._map(
+            lambda k: self._write(k, self._data[k], self.paths_dict[k], **kwargs),
+            self.paths_dict.keys(),
+            "save",
+        )
+
+    def dumps(self, **kwargs) -> Dict[Any, bytes]:
+        """
+        Serializes every entry into the content of its file
+
+        :return: content of each id
+        """
+
+        return self._map(
+            lambda k: self._dumps(self._data[k], **kwargs),
+            self.paths_dict.keys(),
+            "serialize",
+        )
+
+    def save_contents(self, contents: Dict[Any, bytes]):
+        """
+        Writes already serialized entries, each one to its own file
+
+        :param contents: content of each id, as given by `dumps`
+        """
+
+        self._map(
+            lambda k: Path(self.paths_dict[k]).write_bytes(contents[k]),
+            contents.keys(),
+            "save",
+        )
+
+    def save_packed(
+        self,
+        contents: Dict[Any, bytes] = None,
+        kept: Dict[Any, PackedLocation] = None,
+        **kwargs,
+    ) -> Dict[Any, PackedLocation]:
+        """
+        Appends entries to the packed files given in ``paths_dict``, several ids
+        sharing the same file. Each file is written by a single thread
+
+        :param contents: already serialized content of each id. If not given, all
+            entries are serialized
+        :param kept: if given, packed files are rewritten instead of appended to,
+            holding only the new entries and these already packed ones, so the space
+            of replaced entries is reclaimed. Files of kept entries are rewritten
+            even if no new entry goes to them
+
+        :return: location of each id inside of its packed file
+        """
+
+        contents = contents if contents is not None else self.dumps(**kwargs)
+        keys_by_path = defaultdict(list)
+        for k in contents.keys():
+            keys_by_path[Path(self.paths_dict[k])].append(k)
+        kept_by_path = defaultdict(list)
+        for k, location in (kept or {}).items():
+            kept_by_path[Path(location.path)].append(k)
+
+        def write(file, path):
+            locations = {}
+            for k in kept_by_path[path]:
+                content = self._read_bytes(kept[k])
+                locations[k] = PackedLocation(path, file.tell(), len(content))
+                file.write(content)
+            for k in keys_by_path[path]:
+                locations[k] = PackedLocation(path, file.tell(), len(contents[k]))
+                file.write(contents[k])
+            return locations
+
+        def append(path):
+            with open(path, "ab") as file:
+                return write(file, path)
+
+        def rewrite(path):
+            # Written aside and swapped, since kept entries are read from the file
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            with open(tmp_path, "wb") as file:
+                locations = write(file, path)
+            os.replace(tmp_path, path)
+            return locations
+
+        paths = set(keys_by_path) | set(kept_by_path)
+        locations = self._map(rewrite if kept is not None else append, paths, "save")
+        return {k: v for path in locations.values() for k, v in path.items()}
+
     def _load(self):
+        self._data = self._map(
+            lambda k: self._read_entry(self.paths_dict[k]),
+            self.paths_dict.keys(),
+            "load",
+        )
+
+    def _read_entry(self, location: Union[Path, PackedLocation]) -> Any:
+        if isinstance(location, PackedLocation):
+            return self._loads(self._read_bytes(location))
+        return self._read(location)
+
+    @staticmethod
+    def _read_bytes(location: PackedLocation) -> bytes:
+        with open(location.path, "rb") as file:
+            file.seek(location.offset)
+            return file.read(location.size)
+
+    def _map(self, fun: Callable, keys: Iterable, action: str) -> Dict[Any, Any]:
+        """
+        Applies a function to every id, using a thread pool if ``workers > 1``
+
+        :param fun: function taking an id
+        :param keys: ids
+        :param action: name of the action, used in error messages
+
+        :return: result of the function for each id
+
+        :raises FolderDataError: if the function failed for any of the ids. All ids
+            are attempted, and the error of each failed one is reported
+        """
+
+        results, errors = {}, {}
+        if self._workers == 1:
+            for k in keys:
+                try:
+                    results[k] = fun(k)
+                except Exception as error:
+                    errors[k] = error
+        else:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                futures = {k: executor.submit(fun, k) for k in keys}
+                for k, future in futures.items():
+                    try:
+                        results[k] = future.result()
+                    except Exception as error:
+                        errors[k] = error
+
+        if errors:
+            raise FolderDataError(action, errors)
+        return results
+
+    @classmethod
+    def can_serialize(cls) -> bool:
+        """Whether entries can be (de)serialized in memory, as packed files need"""
+
+        return (
+            cls._dumps is not FolderData._dumps and cls._loads is not FolderData._loads
+        )
+
+    @abstractmethod
+    def _read(self, path: Path) -> Any:
         pass
 
     @abstractmethod
-    def save(self, **kwargs):
+    def _write(self, k: Any, data: Any, path: Path, **kwargs):
         pass
 
+    def _loads(self, content: bytes) -> Any:
+        raise NotImplementedError(f"{type(self).__name__} can't deserialize entries")
+
+    def _dumps(self, data: Any, **kwargs) -> bytes:
+        raise NotImplementedError(f"{type(self).__name__} can't serialize entries")
+
+
+def _sizeof(data: Any) -> int:
+    """Estimates the memory used by an entry"""
+
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return int(data.memory_usage(index=True, deep=True).sum())
+    if isinstance(data, dict):
+        return sys.getsizeof(data) + sum(
+            _sizeof(k) + _sizeof(v) for k, v in data.items()
+        )
+    if isinstance(data, (list, tuple)):
+        return sys.getsizeof(data) + sum(_sizeof(x) for x in data)
+    return sys.getsizeof(data)
+
 
 class JSONFolderData(FolderData):
     """Handles data that is split into JSON files inside of a folder"""
 
-    def _load(self):
-        self._data = {k: read_json(self.paths_dict[k]) for k in self.paths_dict.keys()}
+    def _read(self, path):
+        return read_json(path)
+
+    def _write(self, k, data, path, **kwargs):
+        save_json(data, path)
+
+    def _loads(self, content):
+        return json.loads(content)
 
-    def save(self):
-        for k in self.paths_dict.keys():
-            save_json(self._data[k], self.paths_dict[k])
+    def _dumps(self, data, **kwargs):
+        return json.dumps(data).encode("utf-8")
 
 
 class CSVFolderData(FolderData):
     """Handles data that is split into CSV files inside of a folder"""
 
-    def _load(self):
-        self._data = {
-            k: pd.read_csv(self.paths_dict[k]) for k in self.paths_dict.keys()
-        }
+    def _read(self, path):
+        return pd.read_csv(path, **self._load_args)
 
-    def save(self, **kwargs):
-        for k in self.paths_dict.keys():
-            self._data[k].to_csv(self.paths_dict[k], **kwargs)
+    def _write(self, k, data, path, **kwargs):
+        data.to_csv(path, **kwargs)
+
+    def _loads(self, content):
+        return pd.read_csv(io.BytesIO(content), **self._load_args)
+
+    def _dumps(self, data, **kwargs):
+        return data.to_csv(**kwargs).encode("utf-8")
 
 
 class ExcelFolderData(FolderData):
     """Handles data that is split into EXCEL files inside of a folder"""
 
-    def _load(self):
-        self._data = {
-            k: pd.read_excel(self.paths_dict[k]) for k in self.paths_dict.keys()
-        }
+    def _read(self, path):
+        return pd.read_excel(path, **self._load_args)
 
-    def save(self, **kwargs):
-        for k in self.paths_dict.keys():
-            self._data[k].to_excel(self.paths_dict[k], **kwargs)
+    def _write(self, k, data, path, **kwargs):
+        data.to_excel(path, **kwargs)
 
 
 class HDFFolderData(FolderData):
     """Handles data that is split into EXCEL files inside of a folder"""
 
-    def _load(self):
-        self._data = {
-            k: pd.read_hdf(self.paths_dict[k]) for k in self.paths_dict.keys()
-        }
+    def _read(self, path):
+        return pd.read_hdf(path, **self._load_args)
 
-    def save(self, **kwargs):
-        for k in self.paths_dict.keys():
-            self._data[k].to_hdf(self.paths_dict[k], **kwargs, key=str(k))
+    def _write(self, k, data, path, **kwargs):
+        data.to_hdf(path, **kwargs, key=str(k))
+
+
+class ParquetFolderData(FolderData):
+    """
+    Handles data that is split into Parquet files inside of a folder. Dtypes are
+    preserved, and a subset of columns can be loaded through ``columns`` load arg
+    """
+
+    def _read(self, path):
+        return pd.read_parquet(path, **self._load_args)
+
+    def _write(self, k, data, path, **kwargs):
+        kwargs = {"compression": "snappy", **kwargs}
+        data.to_parquet(path, **kwargs)
+
+    def _loads(self, content):
+        return pd.read_parquet(io.BytesIO(content), **self._load_args)
+
+    def _dumps(self, data, **kwargs):
+        buffer = io.BytesIO()
+        self._write(None, data, buffer, **kwargs)
+        return buffer.getvalue()
@@ -1,6 +1,7 @@
+import codecs
 import json
 from pathlib import Path
-from typing import Union
+from typing import IO, Any, Iterator, List, Union
 
 import yaml
 
@@ -20,6 +21,111 @@ def read_json(file: Union[str, Path]) -> dict:
     return data
 
 
+def iter_json_items(
+    buffer: IO, subset: List[str] = None, chunk_size: int = 65536
+) -> Iterator[Any]:
+    """
+    Incrementally parses a JSON document, yielding one at a time the items of the
+    array found under a path of keys. Only one item is held in memory at a time
+
+    :param buffer: text or binary (utf-8) buffer containing the JSON document
+    :param subset: path of keys leading to the array, e.g. ``["api", "fixtures"]``
+    :param chunk_size: number of bytes read from the buffer at a time
+
+    :return: iterator over the items of the array
+
+    :raises KeyError: if a key of ``subset`` is missing, as indexing would
+    """
+
+    reader = _JSONStreamReader(buffer, chunk_size)
+    for key in subset if subset else []:
+        reader.expect("{")
+        if reader.peek() == "}":
+            raise KeyError(key)
+        while reader.decode() != key:
+            reader.expect(":")
+            reader.decode()
+            if reader.peek() == "}":
+                raise KeyError(key)
+            reader.expect(",")
+        reader.expect(":")
+
+    if reader.peek() == "n":
+        reader.decode()
+        return
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.decode()
+        if reader.peek() == "]":
+            return
+        reader.expect(",")
+
+
+class _JSONStreamReader:
+    """Reads JSON tokens and values from a buffer, a chunk at a time"""
+
+    def __init__(self, buffer: IO, chunk_size: int):
+        self._buffer = buffer
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._text = ""
+        self._pos = 0
+        self._eof = False
+
+    def peek(self) -> str:
+        """Skips whitespace and returns next character, empty string if at EOF"""
+
+        while True:
+            while self._pos < len(self._text) and self._text[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._text) or self._eof:
+                return self._text[self._pos : self._pos + 1]  # noqa: E203
+            self._fill(self._chunk_size)
+
+    def expect(self, char: str):
+        """Consumes a structural character"""
+
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{found}'")
+        self._pos += 1
+
+    def decode(self) -> Any:
+        """Decodes next JSON value, reading more of the buffer until it is complete"""
+
+        self.peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._text, self._pos)
+                # A number ending at the end of the text, or followed by the start
+                # of its fraction or exponent, may be truncated
+                truncated = end == len(self._text) or self._text[end] in ".eE"
+                if not truncated or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def _fill(self, size: int):
+        chunk = self._buffer.read(size)
+        if not chunk:
+            self._eof = True
+        text = (
+            self._decoder.decode(chunk, final=self._eof)
+            if isinstance(chunk, bytes)
+            else chunk
+        )
+        self._text = self._text[self._pos :] + text  # noqa: E203
+        self._pos = 0
+
+
 def save_json(dict_object: dict, file: Union[str, Path]):
     """
     Save dictionary into JSON file
@@ -5,7 +5,9 @@ import pandas as pd
 
 def unpack_columns(df, cols: List[Any]) -> pd.DataFrame:
     """
-    Unpacks 2-level columns in a DataFrame
+    Unpacks 2-level columns in a DataFrame. Each column of dictionaries is built in
+    bulk from its list of records, and missing values (non-dict cells) are unpacked
+    into NaN
 
     :param df: table to unpack
     :param cols: name of columns to unpack
@@ -17,7 +19,8 @@ def unpack_columns(df, cols: List[Any]) -> pd.DataFrame:
         cols = [cols]
     res = []
     for col in cols:
-        unpacked = df[col].apply(pd.Series)
+        records = [x if isinstance(x, dict) else {} for x in df[col].tolist()]
+        unpacked = pd.DataFrame.from_records(records, index=df.index)
         unpacked.columns = [f"{col}_{x}" for x in unpacked.columns]
         res.append(unpacked)
 
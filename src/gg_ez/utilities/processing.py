@@ -1,7 +1,7 @@
 from multiprocessing import Pool
 from queue import Queue
 from threading import Thread
-from typing import Callable, Iterable, List
+from typing import Callable, Iterable, Iterator, List
 
 
 class Worker(Thread):
@@ -92,3 +92,25 @@ def apply_multiprocessing(fun: Callable, iterable: Iterable, n_cores: int = 1) -
         pool.close()
         pool.join()
         return result_par
+
+
+def iapply_multiprocessing(
+    fun: Callable, iterable: Iterable, n_cores: int = 1, chunksize: int = 1000
+) -> Iterator:
+    """
+    Lazy version of `apply_multiprocessing`. Results are yielded in order as they
+    are computed, so neither the inputs nor the results are held in memory at once
+
+    :param fun: function to be applied
+    :param iterable: iterable object to apply fuction on
+    :param n_cores: number of cores
+    :param chunksize: number of elements sent to each process at a time
+
+    :return: iterator over results of function
+    """
+
+    if n_cores == 1:
+        yield from map(fun, iterable)
+    else:
+        with Pool(processes=n_cores) as pool:
+            yield from pool.imap(fun, iterable, chunksize=chunksize)
@@ -0,0 +1,438 @@
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Edge of a window: a number of rows, or a time lag for windows over a date column
+Bound = Union[int, np.timedelta64]
+Offsets = Union[int, np.ndarray]
+
+
+class RollingWindow:
+    """
+    Aggregations of a feature over windows of rows, computed in O(n) memory
+    regardless of the length of the windows.
+
+    A window ``(start, stop)`` covers rows ``i + start`` to ``i + stop`` (both
+    included) of every row ``i``, clipped to the rows of the same id. Like the shift
+    matrix of `expand_by_period`, rows of other ids count as NaN: plain aggregations
+    are NaN unless the whole window is inside the id and non-NaN, while NaN variants
+    aggregate the values available.
+
+    If dates are given, windows can also be defined by time: ``(start, stop)`` as
+    `np.timedelta64` covers the rows of the same id whose date is at least ``start``
+    and less than ``stop`` before the date of row ``i``. Its rows are found by
+    binary search over the dates of the id, so ids don't need a row per period.
+    Time windows only hold dates of the id, so they are never incomplete: plain
+    aggregations over them are only NaN because of NaN values.
+
+    Aggregations are computed by the kernels in `WINDOW_KERNELS`, which share the
+    intermediate results of every window: counts and sums are range queries over
+    prefix sums, and running aggregations are grown one row at a time from the
+    largest window already computed that shares an edge, so nested windows cost a
+    single pass overall.
+    """
+
+    def __init__(
+        self, feature: np.ndarray, mask: np.ndarray, dates=None, dtype=np.float64
+    ):
+        """
+        :param feature: values of the feature, sorted by id
+        :param mask: vector with one element less than ``feature``, indicating
+            where the id changes
+        :param dates: dates of every row, sorted descending within each id.
+            Required by windows defined by time
+        :param dtype: type of the aggregations. They are computed in float64 and
+            cast to it
+        """
+
+        self.values = feature.astype(np.float64)
+        self.dtype = np.dtype(dtype)
+        n_rows = len(self.values)
+        starts = np.concatenate(([0], np.flatnonzero(mask) + 1))
+        ends = np.concatenate((starts[1:], [n_rows])) - 1
+        sizes = ends - starts + 1
+        self._positions = np.arange(n_rows)
+        self._group_start = np.repeat(starts, sizes)
+        self._group_end = np.repeat(ends, sizes)
+        self._groups = np.repeat(np.arange(len(starts)), sizes)
+        # Number of rows of the same id before and after every row
+        self._rows_before = self._positions - self._group_start
+        self._rows_after = self._group_end - self._positions
+        self._dates = None if dates is None else np.asarray(dates, "datetime64[ns]")
+        self._unique_dates = None
+        self._date_keys = None
+        self._prefix_sums: Dict[str, List[np.ndarray]] = {}
+        self._offsets: Dict[Tuple[Bound, Bound], Tuple[Offsets, Offsets]] = {}
+        self._results: Dict[Tuple[str, Bound, Bound], np.ndarray] = {}
+
+    def aggregate(self, agg_name: str, start: Bound, stop: Bound) -> np.ndarray:
+        """
+        Aggregates the feature over a window of rows
+
+        :param agg_name: name of a kernel in `WINDOW_KERNELS`
+        :param start: first row of the window, relative to each row
+        :param stop: last row of the window, relative to each row
+
+        :return: aggregation of every row
+        """
+
+        if agg_name not in WINDOW_KERNELS:
+            raise ValueError(
+                f"got agg_name={agg_name}, expected one of {list(WINDOW_KERNELS)}"
+            )
+        aggregation = WINDOW_KERNELS[agg_name](self, start, stop)
+        return aggregation.astype(self.dtype, copy=False)
+
+    def count(self, start: Bound, stop: Bound) -> np.ndarray:
+        """Number of non-NaN values in the window of every row"""
+
+        return self._range_sum("count", start, stop)
+
+    def sum(self, start: Bound, stop: Bound) -> np.ndarray:
+        """Sum of the non-NaN values in the window of every row"""
+
+        return self._range_sum("sum", start, stop)
+
+    def mean(self, start: Bound, stop: Bound) -> np.ndarray:
+        """Mean of the non-NaN values in the window of every row"""
+
+        def compute():
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return self.sum(start, stop) / self.count(start, stop)
+
+        return self.cached("mean", start, stop, compute)
+
+    def cached(
+        self, name: str, start: Bound, stop: Bound, compute: Callable[[], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Intermediate result of a window, computed only the first time it is needed
+
+        :param name: name of the result
+        :param start: first row of the window, relative to each row
+        :param stop: last row of the window, relative to each row
+        :param compute: function computing the result
+
+        :return: result of every row
+        """
+
+        key = (name, start, stop)
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    def empty(self) -> np.ndarray:
+        return np.full(len(self.values), np.nan)
+
+    def is_complete(self, start: Bound, stop: Bound) -> np.ndarray:
+        """Whether the whole window of every row is inside its id and non-NaN"""
+
+        lower, upper = self.get_offsets(start, stop)
+        return self.count(start, stop) == np.maximum(upper - lower + 1, 0)
+
+    def get_offsets(self, start: Bound, stop: Bound) -> Tuple[Offsets, Offsets]:
+        """
+        First and last row of the window of every row, relative to it. They are
+        the same for every row unless the window is defined by time
+
+        :param start: start of the window
+        :param stop: end of the window
+
+        :return: offsets of the first and last rows
+        """
+
+        if not isinstance(start, np.timedelta64):
+            return start, stop
+        if (start, stop) not in self._offsets:
+            if self._dates is None:
+                raise ValueError("Windows defined by time need the dates of the rows")
+            first = self._first_row_until(self._dates - start) - self._positions
+            last = self._first_row_until(self._dates - stop) - 1 - self._positions
+            self._offsets[(start, stop)] = (first, last)
+        return self._offsets[(start, stop)]
+
+    def iter_shifts(
+        self, start: Bound, stop: Bound
+    ) -> Iterator[Tuple[int, Union[bool, np.ndarray]]]:
+        """
+        Iterates over the shifts of the rows of the window of every row
+
+        :param start: start of the window
+        :param stop: end of the window
+
+        :return: iterator of shifts, along with whether that shift is inside of the
+            window of every row
+        """
+
+        lower, upper = self.get_offsets(start, stop)
+        if isinstance(lower, np.ndarray):
+            shifts = range(lower.min(), upper.max() + 1) if len(lower) else []
+            for shift in shifts:
+                yield shift, (lower <= shift) & (shift <= upper)
+        else:
+            for shift in range(lower, upper + 1):
+                yield shift, True
+
+    def take(self, offsets: Offsets, valid: Union[bool, np.ndarray]) -> np.ndarray:
+        """
+        Value of the row at a given offset from every row, NaN if not valid
+
+        :param offsets: offset from every row
+        :param valid: whether the offset of every row is valid
+
+        :return: value of every row
+        """
+
+        if not isinstance(offsets, np.ndarray):
+            return self.shift(offsets) if valid else self.empty()
+        rows = self._positions + offsets
+        inside = valid & (rows >= self._group_start) & (rows <= self._group_end)
+        values = self.empty()
+        values[inside] = self.values[rows[inside]]
+        return values
+
+    def shift(self, shift: int) -> np.ndarray:
+        """Value ``shift`` rows away from every row, NaN if of another id"""
+
+        n_rows = len(self.values)
+        shifted = np.full(n_rows, np.nan)
+        if shift >= 0:
+            shifted[: max(n_rows - shift, 0)] = self.values[shift:]
+            shifted[self._rows_after < shift] = np.nan
+        else:
+            shifted[-shift:] = self.values[: max(n_rows + shift, 0)]
+            shifted[self._rows_before < -shift] = np.nan
+        return shifted
+
+    def accumulate(
+        self, name: str, combine: Callable, start: Bound, stop: Bound
+    ) -> np.ndarray:
+        """
+        Running aggregation over the window of every row, grown one row at a time
+        from the largest window already computed under the same name that shares
+        one of its edges
+
+        :param name: name of the aggregation, identifying already computed windows
+        :param combine: function combining the aggregation of some rows with the
+            one of the rows right after them, e.g. `np.maximum`
+        :param start: first row of the window, relative to each row
+        :param stop: last row of the window, relative to each row
+
+        :return: aggregation of every row, NaN for empty windows
+        """
+
+        key = (name, start, stop)
+        if key in self._results:
+            return self._results[key]
+        if isinstance(start, np.timedelta64):
+            result, started = self.empty(), np.zeros(len(self.values), dtype=bool)
+            for shift, inside in self.iter_shifts(start, stop):
+                shifted = self.shift(shift)
+                combined = np.where(started, combine(result, shifted), shifted)
+                result = np.where(inside, combined, result)
+                started |= inside
+            self._results[key] = result
+            return result
+        if stop < start:
+            return self.empty()
+
+        computed = [(s, e) for n, s, e in self._results if n == name]
+        same_start = [e for s, e in computed if s == start and e < stop]
+        same_stop = [s for s, e in computed if e == stop and s > start]
+        if same_start:
+            result = self._results[(name, start, max(same_start))]
+            for shift in range(max(same_start) + 1, stop + 1):
+                result = combine(result, self.shift(shift))
+        elif same_stop:
+            result = self._results[(name, min(same_stop), stop)]
+            for shift in reversed(range(start, min(same_stop))):
+                result = combine(self.shift(shift), result)
+        else:
+            result = self.shift(start)
+            for shift in range(start + 1, stop + 1):
+                result = combine(result, self.shift(shift))
+
+        self._results[key] = result
+        return result
+
+    def _first_row_until(self, max_dates: np.ndarray) -> np.ndarray:
+        """
+        First row of the id of every row with a date at most the given one, or the
+        row right after the id if there is none
+        """
+
+        if self._date_keys is None:
+            # Rows are sorted by id and descending date, so keys combining the id
+            # and the reversed dense rank of the date are sorted too
+            self._unique_dates = np.unique(self._dates)
+            ranks = np.searchsorted(self._unique_dates, self._dates)
+            self._date_keys = self._get_date_keys(ranks)
+        max_ranks = np.searchsorted(self._unique_dates, max_dates, side="right") - 1
+        return np.searchsorted(self._date_keys, self._get_date_keys(max_ranks))
+
+    def _get_date_keys(self, ranks: np.ndarray) -> np.ndarray:
+        n_dates = len(self._unique_dates)
+        return self._groups * n_dates + (n_dates - 1 - ranks)
+
+    def _range_sum(self, name: str, start: Bound, stop: Bound) -> np.ndarray:
+        return self.cached(name, start, stop, lambda: self._query(name, start, stop))
+
+    def _query(self, name: str, start: Bound, stop: Bound) -> np.ndarray:
+        # Prefix sums restart at every id, and infinite values are counted apart,
+        # so they don't turn the sums of later windows into NaN
+        if name not in self._prefix_sums:
+            if name == "count":
+                columns = [~np.isnan(self.values)]
+            else:
+                is_finite = np.isfinite(self.values)
+                columns = [
+                    np.where(is_finite, self.values, 0),
+                    is_finite,
+                    self.values == np.inf,
+                    self.values == -np.inf,
+                ]
+            groups = pd.DataFrame(np.column_stack(columns), dtype=np.float64)
+            cumsums = groups.groupby(self._groups).cumsum().values
+            self._prefix_sums[name] = list(cumsums.T)
+
+        # First and last row of the window of every row, clipped to its id
+        start, stop = self.get_offsets(start, stop)
+        lower = np.maximum(self._positions + start, self._group_start)
+        upper = np.minimum(self._positions + stop, self._group_end)
+        empty = upper < lower
+        last = np.clip(upper, 0, max(len(self.values) - 1, 0))
+        before = np.where(lower > self._group_start, lower - 1, -1)
+        sums = [
+            np.where(empty, 0, prefix_sum[last] - _take(prefix_sum, before))
+            for prefix_sum in self._prefix_sums[name]
+        ]
+        if name == "count":
+            return sums[0]
+
+        # Windows without finite values add up to exactly 0
+        total, n_finite, n_positive, n_negative = sums
+        total = np.where(n_finite > 0, total, 0)
+        total = np.where(n_positive > 0, np.inf, total)
+        total = np.where(n_negative > 0, -np.inf, total)
+        return np.where((n_positive > 0) & (n_negative > 0), np.nan, total)
+
+
+def _take(prefix_sum: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    # Prefix sum until each row, 0 for rows before the start of the id (-1). Rows
+    # past the end only belong to empty windows, so any value does
+    clipped = np.clip(rows, 0, max(len(prefix_sum) - 1, 0))
+    return np.where(rows >= 0, prefix_sum[clipped], 0)
+
+
+WINDOW_KERNELS: Dict[str, Callable[[RollingWindow, Bound, Bound], np.ndarray]] = {}
+
+
+def register_window_kernel(name: str, kernel: Callable, nan_variant: bool = True):
+    """
+    Registers an aggregation computed by `RollingWindow`, so that `expand_by_period`
+    computes it without building the shift matrix
+
+    :param name: name of the aggregation, as given to `expand_by_period`
+    :param kernel: function taking a `RollingWindow`, the start and end of the
+        window and whether NaN values are skipped, returning the aggregation of
+        every row
+    :param nan_variant: whether to also register ``nan{name}``, skipping NaN values
+    """
+
+    WINDOW_KERNELS[name] = lambda window, start, stop: kernel(
+        window, start, stop, False
+    )
+    if nan_variant:
+        WINDOW_KERNELS[f"nan{name}"] = lambda window, start, stop: kernel(
+            window, start, stop, True
+        )
+
+
+def _nan_unless(valid: np.ndarray, values: np.ndarray) -> np.ndarray:
+    return np.where(valid, values, np.nan)
+
+
+def _sum(window: RollingWindow, start: Bound, stop: Bound, skipna: bool) -> np.ndarray:
+    if skipna:
+        return window.sum(start, stop)
+    return _nan_unless(window.is_complete(start, stop), window.sum(start, stop))
+
+
+def _mean(window: RollingWindow, start: Bound, stop: Bound, skipna: bool) -> np.ndarray:
+    if skipna:
+        return window.mean(start, stop)
+    return _nan_unless(window.is_complete(start, stop), window.mean(start, stop))
+
+
+def _var(window: RollingWindow, start: Bound, stop: Bound, skipna: bool) -> np.ndarray:
+    # Deviations are added up one row at a time, since differences of prefix sums
+    # of squares lose too much precision
+    def compute():
+        mean = window.mean(start, stop)
+        squares = np.zeros(len(window.values))
+        for shift, inside in window.iter_shifts(start, stop):
+            deviations = (window.shift(shift) - mean) ** 2
+            squares += np.where(inside & ~np.isnan(deviations), deviations, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = squares / window.count(start, stop)
+        # Like numpy, the variance of windows with infinite values is NaN
+        return _nan_unless(np.isfinite(mean), var)
+
+    var = window.cached("var", start, stop, compute)
+    return var if skipna else _nan_unless(window.is_complete(start, stop), var)
+
+
+def _std(window: RollingWindow, start: Bound, stop: Bound, skipna: bool) -> np.ndarray:
+    return np.sqrt(_var(window, start, stop, skipna))
+
+
+def _count(
+    window: RollingWindow, start: Bound, stop: Bound, skipna: bool
+) -> np.ndarray:
+    return window.count(start, stop)
+
+
+def _min(window: RollingWindow, start: Bound, stop: Bound, skipna: bool) -> np.ndarray:
+    if skipna:
+        return window.accumulate("nanmin", np.fmin, start, stop)
+    return window.accumulate("min", np.minimum, start, stop)
+
+
+def _max(window: RollingWindow, start: Bound, stop: Bound, skipna: bool) -> np.ndarray:
+    if skipna:
+        return window.accumulate("nanmax", np.fmax, start, stop)
+    return window.accumulate("max", np.maximum, start, stop)
+
+
+def _first(window: RollingWindow, start: Bound, stop: Bound, skipna: bool):
+    """Oldest value of the window, i.e. its last row"""
+
+    if skipna:
+        return window.accumulate(
+            "nanfirst", lambda new, old: np.where(np.isnan(old), new, old), start, stop
+        )
+    lower, upper = window.get_offsets(start, stop)
+    return window.take(upper, lower <= upper)
+
+
+def _last(window: RollingWindow, start: Bound, stop: Bound, skipna: bool):
+    """Newest value of the window, i.e. its first row"""
+
+    if skipna:
+        return window.accumulate(
+            "nanlast", lambda new, old: np.where(np.isnan(new), old, new), start, stop
+        )
+    lower, upper = window.get_offsets(start, stop)
+    return window.take(lower, lower <= upper)
+
+
+register_window_kernel("sum", _sum)
+register_window_kernel("mean", _mean)
+register_window_kernel("var", _var)
+register_window_kernel("std", _std)
+register_window_kernel("count", _count, nan_variant=False)
+register_window_kernel("min", _min)
+register_window_kernel("max", _max)
+register_window_kernel("first", _first)
+register_window_kernel("last", _last)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gg_ez.utilities.expand_by_period import expand_by_period
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n_rows = 500
+    values = rng.normal(scale=100, size=n_rows)
+    values[rng.choice(n_rows, 50, replace=False)] = np.nan
+    values[rng.choice(n_rows, 5, replace=False)] = np.inf
+    values[rng.choice(n_rows, 5, replace=False)] = -np.inf
+    return pd.DataFrame(
+        {
+            "id": rng.integers(0, 20, n_rows),
+            "date": rng.permutation(n_rows),
+            "value": values,
+        }
+    )
+
+
+class TestExpandByPeriod:
+    @pytest.mark.filterwarnings("ignore::RuntimeWarning")
+    @pytest.mark.parametrize("latest_period_available", [0, 1, 2])
+    @pytest.mark.parametrize("periods", [[3, 10], [3, 6], [-5, -1, 3, 7]])
+    def test_auto_engine_equals_shift(self, df, periods, latest_period_available):
+        agg = {"value": ["sum", "mean", "nansum", "nanmean", "nanmax", "nanstd"]}
+        kwargs = dict(
+            id_col=["id"],
+            date_col=["date"],
+            periods=periods,
+            agg=agg,
+            latest_period_available=latest_period_available,
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shift = expand_by_period(df, engine="shift", **kwargs)
+            auto = expand_by_period(df, engine="auto", **kwargs)
+        pd.testing.assert_frame_equal(auto, shift)